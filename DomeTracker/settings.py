@@ -24,7 +24,31 @@ load_dotenv()
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = getenv("SECRET_KEY")
 X_RIOT_TOKEN = getenv("X_RIOT_TOKEN")
+# used until Riot reports the real limits in the X-App-Rate-Limit header
+RIOT_APP_RATE_LIMIT = getenv("RIOT_APP_RATE_LIMIT", "20:1,100:120")
+RIOT_RETRY_AFTER = int(getenv("RIOT_RETRY_AFTER", 10))
+POLL_WORKERS = int(getenv("POLL_WORKERS", 8))
+# seconds between polls for active and fully dormant summoners
+POLL_MIN_INTERVAL = int(getenv("POLL_MIN_INTERVAL", 300))
+POLL_MAX_INTERVAL = int(getenv("POLL_MAX_INTERVAL", 86400))
+# match ids requested per poll to catch up on games played in between
+POLL_MATCH_WINDOW = int(getenv("POLL_MATCH_WINDOW", 20))
+# raw match-v5 payloads, see apps/match/archive.py
+MATCH_ARCHIVE_BACKEND = getenv(
+    "MATCH_ARCHIVE_BACKEND", "apps.match.archive.ShardedGzipArchive"
+)
+MATCH_ARCHIVE_ROOT = Path(getenv("MATCH_ARCHIVE_ROOT", BASE_DIR / "matches"))
+# Change audit rows older than this many days, or past this many per object,
+# are removed by scripts/compact_changes.py. 0 keeps them
+CHANGE_RETENTION_DAYS = int(getenv("CHANGE_RETENTION_DAYS", 365))
+CHANGE_RETENTION_PER_OBJECT = int(getenv("CHANGE_RETENTION_PER_OBJECT", 500))
 DISCORD_TOKEN = getenv("DISCORD_TOKEN")
+# threads for the bot's database work, and how long a command may take in
+# seconds, by default and per command name, see bot_executor.py
+BOT_DB_WORKERS = int(getenv("BOT_DB_WORKERS", 8))
+BOT_COMMAND_TIMEOUT = float(getenv("BOT_COMMAND_TIMEOUT", 10))
+BOT_COMMAND_TIMEOUTS = getenv("BOT_COMMAND_TIMEOUTS", "track:60,graph:30,weekly:30")
+BOT_MATCHES_PAGE_SIZE = int(getenv("BOT_MATCHES_PAGE_SIZE", 50))
 IMGFLIP_PW = getenv("IMGFLIP_PW")
 DISCORD_ERROR_HOOK = getenv("DISCORD_ERROR_HOOK")
 
@@ -95,6 +119,25 @@ DATABASES = {
 }
 
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # bot responses per summoner, see apps/summoner/cache.py. the cron's poll
+    # moves each summoner's latest-match pointer in here, so the bot and cron
+    # must share it: files on one host, redis/memcached across hosts
+    "summoner": {
+        "BACKEND": getenv(
+            "SUMMONER_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": getenv("SUMMONER_CACHE_LOCATION", str(BASE_DIR / "cache")),
+        "TIMEOUT": int(getenv("SUMMONER_CACHE_TTL", 300)),
+        "OPTIONS": {"MAX_ENTRIES": int(getenv("SUMMONER_CACHE_SIZE", 1000))},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
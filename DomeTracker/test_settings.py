@@ -7,4 +7,11 @@ DATABASES = {
     }
 }
 
+# per process, tests shouldn't write cache files
+CACHES["summoner"] = {
+    **CACHES["summoner"],
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "summoner",
+}
+
 SECRET_KEY = "test-secret-key-not-for-production"
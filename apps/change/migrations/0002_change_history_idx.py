@@ -0,0 +1,20 @@
+# Generated by Django 4.2.29 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("change", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="change",
+            index=models.Index(
+                fields=["content_type", "object_id", "created_at"],
+                name="change_history_idx",
+            ),
+        ),
+    ]
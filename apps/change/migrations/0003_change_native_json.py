@@ -0,0 +1,49 @@
+# Generated by Django 4.2.29 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+# GIN indexes only exist on PostgreSQL, so they're created here rather than
+# declared on the model: has_key (?) lookups on changes, containment (@>)
+# lookups on new_object. kept here rather than imported from models, so this
+# migration doesn't change when the app code does
+GIN_INDEXES = [
+    ("change_changes_gin", "changes"),
+    ("change_new_object_gin", "new_object jsonb_path_ops"),
+]
+
+
+def create_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, expression in GIN_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON change_change USING gin ({expression})"
+        )
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, expression in GIN_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("change", "0002_change_history_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="change",
+            name="changes",
+            field=models.JSONField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="change",
+            name="new_object",
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
@@ -1,8 +1,21 @@
-from django.db import models
-import jsonfield
+from django.db import connection, models
+import threading
+from contextlib import contextmanager
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
+# GIN indexes only exist on PostgreSQL, so they're created by migration 0003
+# (and again by retention.partition_table) rather than declared on the model:
+# has_key (?) lookups on changes, containment (@>) lookups on new_object
+GIN_INDEXES = [
+    ("change_changes_gin", "changes"),
+    ("change_new_object_gin", "new_object jsonb_path_ops"),
+]
+
+# Change rows collected by an open Change.buffered() block, None otherwise
+buffer_lock = threading.Lock()
+buffered_changes = None
+
 
 # Create your models here.
 class Change(models.Model):
@@ -11,12 +24,66 @@ class Change(models.Model):
     )
     object_id = models.PositiveIntegerField(null=True)
     content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True)
-    changes = jsonfield.JSONField(null=True)
-    new_object = jsonfield.JSONField(null=True)
+    changes = models.JSONField(null=True)
+    new_object = models.JSONField(null=True)
     ref_object = GenericForeignKey()
 
+    class Meta:
+        indexes = [
+            # an object's history, also the order compaction walks it in
+            models.Index(
+                fields=["content_type", "object_id", "created_at"],
+                name="change_history_idx",
+            ),
+        ]
+
     def __str__(self):
         """
         Str function to elaborate Action objects.
         """
         return f"Action (ID: {self.id}, Created at: {self.created_at})"
+
+    @staticmethod
+    def field_history(field, **identity):
+        # changes to one field of the objects matching identity, e.g.
+        # Change.field_history("name", puu_id=...), oldest first as
+        # (created_at, old value, new value)
+        if connection.vendor == "postgresql":
+            # containment, so it's answered from the GIN index on new_object
+            lookup = {"new_object__contains": identity}
+        else:
+            lookup = {f"new_object__{key}": value for key, value in identity.items()}
+        return (
+            Change.objects.filter(changes__has_key=field, **lookup)
+            .order_by("created_at", "pk")
+            .values_list("created_at", f"changes__{field}", f"new_object__{field}")
+        )
+
+    @staticmethod
+    def log(ref_object, changes, new_object):
+        change = Change(ref_object=ref_object, changes=changes, new_object=new_object)
+        with buffer_lock:
+            if buffered_changes is not None:
+                buffered_changes.append(change)
+                return change
+        change.save()
+        return change
+
+    @staticmethod
+    @contextmanager
+    def buffered():
+        # changes logged inside the block, from any thread, are written with
+        # one bulk insert when it closes. Nested blocks join the outer one
+        global buffered_changes
+        with buffer_lock:
+            owner = buffered_changes is None
+            if owner:
+                buffered_changes = []
+        try:
+            yield
+        finally:
+            if owner:
+                with buffer_lock:
+                    changes, buffered_changes = buffered_changes, None
+                if changes:
+                    Change.objects.bulk_create(changes, batch_size=500)
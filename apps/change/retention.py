@@ -0,0 +1,188 @@
+from apps.change.models import Change, GIN_INDEXES
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from datetime import date, datetime, timedelta, timezone
+
+
+def delete_batched(pks, batch_size=1000):
+    deleted = 0
+    for start in range(0, len(pks), batch_size):
+        deleted += Change.objects.filter(
+            pk__in=pks[start : start + batch_size]
+        ).delete()[0]
+    return deleted
+
+
+def collapse_noops(batch_size=1000):
+    # a change that altered nothing and left the object as the row before it
+    # adds no history, only the first row of such a run is kept
+    doomed = []
+    previous_key = previous_object = None
+    rows = (
+        Change.objects.order_by("content_type", "object_id", "created_at", "pk")
+        .values_list("pk", "content_type", "object_id", "changes", "new_object")
+        .iterator(chunk_size=batch_size)
+    )
+    for pk, content_type, object_id, changes, new_object in rows:
+        key = (content_type, object_id)
+        if key == previous_key and not changes and new_object == previous_object:
+            doomed.append(pk)
+            continue
+        previous_key, previous_object = key, new_object
+    # deleted after the scan, sqlite doesn't like rows going away under a cursor
+    return delete_batched(doomed, batch_size)
+
+
+def prune_by_age(days, now=None):
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+    deleted = 0
+    if is_partitioned():
+        deleted += drop_partitions_before(cutoff)
+    return deleted + Change.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+def prune_per_object(keep, batch_size=1000):
+    doomed = list(
+        Change.objects.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("content_type"), F("object_id")],
+                order_by=[F("created_at").desc(), F("pk").desc()],
+            )
+        )
+        .filter(position__gt=keep)
+        .values_list("pk", flat=True)
+    )
+    return delete_batched(doomed, batch_size)
+
+
+def compact(days=0, keep=0):
+    # 0 disables the age or count limit
+    if is_partitioned():
+        ensure_partitions()
+    result = {"noops": collapse_noops(), "expired": 0, "excess": 0}
+    if days:
+        result["expired"] = prune_by_age(days)
+    if keep:
+        result["excess"] = prune_per_object(keep)
+    return result
+
+
+# monthly partitioning, PostgreSQL only, see scripts/partition_changes.py
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [Change._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def month_start(day, offset=0):
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{Change._meta.db_table}_y{month.year}m{month.month:02d}"
+
+
+def create_partition(cursor, month):
+    table = connection.ops.quote_name(Change._meta.db_table)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(partition_name(month))} "
+        f"PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+        [month, month_start(month, 1)],
+    )
+
+
+def ensure_partitions(months_ahead=2, today=None):
+    # rows for months without a partition land in the default partition
+    month = month_start(today or date.today())
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            create_partition(cursor, month_start(month, offset))
+
+
+def drop_partitions_before(cutoff):
+    # whole months past the cutoff go without a DELETE and the vacuum after it
+    cutoff_month = month_start(cutoff.date())
+    dropped = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [Change._meta.db_table],
+        )
+        for (name,) in cursor.fetchall():
+            monthly = name.startswith(f"{Change._meta.db_table}_y")
+            if monthly and name < partition_name(cutoff_month):
+                cursor.execute(
+                    f"SELECT count(*) FROM {connection.ops.quote_name(name)}"
+                )
+                dropped += cursor.fetchone()[0]
+                cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+    return dropped
+
+
+def partition_table():
+    # swaps the table for one partitioned on created_at, with a partition per
+    # month of existing history and a default partition
+    table = Change._meta.db_table
+    quoted = connection.ops.quote_name(table)
+    old = connection.ops.quote_name(f"{table}_unpartitioned")
+    sequence = connection.ops.quote_name(f"{table}_partitioned_id_seq")
+    with transaction.atomic(), connection.cursor() as cursor:
+        # deferred foreign key checks still pending on the table block the
+        # rename and drop below
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"SELECT min(created_at) FROM {quoted}")
+        first = cursor.fetchone()[0] or datetime.now(timezone.utc)
+        cursor.execute(f"ALTER TABLE {quoted} RENAME TO {old}")
+        cursor.execute(
+            f"CREATE TABLE {quoted} (LIKE {old} INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        # a sequence of its own, whether the old id was serial or identity
+        cursor.execute(f"CREATE SEQUENCE {sequence} OWNED BY {quoted}.id")
+        cursor.execute(
+            f"ALTER TABLE {quoted} ALTER COLUMN id SET DEFAULT nextval(%s)",
+            [f"{table}_partitioned_id_seq"],
+        )
+        cursor.execute(
+            f"CREATE TABLE {connection.ops.quote_name(table + '_default')} "
+            f"PARTITION OF {quoted} DEFAULT"
+        )
+        month = month_start(first.date())
+        while month <= month_start(date.today(), 2):
+            create_partition(cursor, month)
+            month = month_start(month, 1)
+        cursor.execute(f"INSERT INTO {quoted} SELECT * FROM {old}")
+        cursor.execute(
+            f"SELECT setval(%s, coalesce(max(id), 0) + 1, false) FROM {quoted}",
+            [f"{table}_partitioned_id_seq"],
+        )
+        cursor.execute(f"DROP TABLE {old}")
+        # the partition key has to be part of the primary key
+        cursor.execute(f"ALTER TABLE {quoted} ADD PRIMARY KEY (id, created_at)")
+        for name, expression in GIN_INDEXES:
+            cursor.execute(f"CREATE INDEX {name} ON {quoted} USING gin ({expression})")
+        # indexes and the foreign key under the names the migrations gave them
+        editor = connection.schema_editor()
+        for sql in editor._model_indexes_sql(Change):
+            cursor.execute(str(sql))
+        cursor.execute(
+            str(
+                editor._create_fk_sql(
+                    Change,
+                    Change._meta.get_field("content_type"),
+                    "_fk_%(to_table)s_%(to_column)s",
+                )
+            )
+        )
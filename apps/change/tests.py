@@ -1,5 +1,20 @@
+from django.db import connection
 from django.test import TestCase
 from apps.change.models import Change
+from apps.change.retention import (
+    collapse_noops,
+    compact,
+    ensure_partitions,
+    is_partitioned,
+    month_start,
+    partition_name,
+    partition_table,
+    prune_by_age,
+    prune_per_object,
+)
+from datetime import date, datetime, timedelta, timezone
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
 from apps.summoner.models import Summoner
 
 
@@ -63,3 +78,208 @@ class TestChangeSignalCreation(TestCase):
         change = Change.objects.last()
         self.assertIsNotNone(change.content_type)
         self.assertEqual(change.object_id, summoner.pk)
+
+
+class TestChangeBuffered(TestCase):
+    def _summoner(self, puu_id):
+        return Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id=puu_id,
+        )
+
+    def test_written_in_one_insert_on_exit(self):
+        initial_count = Change.objects.count()
+        with Change.buffered():
+            summoners = [self._summoner(f"puu_buffered_{i}") for i in range(3)]
+            for summoner in summoners:
+                summoner.name = "Renamed"
+                summoner.save()
+            self.assertEqual(Change.objects.count(), initial_count)
+            # only the summoner update, no insert for its change
+            with self.assertNumQueries(1):
+                summoners[0].save()
+        self.assertEqual(Change.objects.count(), initial_count + 7)
+        latest_change = Change.objects.filter(object_id=summoners[2].pk).last()
+        self.assertEqual(latest_change.changes, {"name": "TestPlayer"})
+        self.assertIsNotNone(latest_change.created_at)
+
+    def test_nested_blocks_flush_once(self):
+        initial_count = Change.objects.count()
+        with Change.buffered():
+            with Change.buffered():
+                self._summoner("puu_buffered_nested")
+            self.assertEqual(Change.objects.count(), initial_count)
+        self.assertEqual(Change.objects.count(), initial_count + 1)
+
+    def test_flushed_on_error(self):
+        initial_count = Change.objects.count()
+        with self.assertRaises(ValueError):
+            with Change.buffered():
+                self._summoner("puu_buffered_error")
+                raise ValueError()
+        self.assertEqual(Change.objects.count(), initial_count + 1)
+
+
+class TestChangeRetention(TestCase):
+    def setUp(self):
+        self.summoners = [
+            Summoner.objects.create(
+                name=f"Player{i}",
+                summoner_id=f"sum{i}",
+                account_id=f"acc{i}",
+                puu_id=f"puu_retention_{i}",
+            )
+            for i in range(2)
+        ]
+        # 2 no-op saves, a rename, 3 more no-op saves
+        for summoner in self.summoners:
+            for name in [None, None, "Renamed", None, None, None]:
+                if name:
+                    summoner.name = name
+                summoner.save()
+        self.now = datetime.now(timezone.utc)
+        for i, change in enumerate(Change.objects.order_by("pk")):
+            Change.objects.filter(pk=change.pk).update(
+                created_at=self.now - timedelta(days=70 - i)
+            )
+
+    def names(self, summoner):
+        return [
+            change.new_object["name"]
+            for change in Change.objects.filter(object_id=summoner.pk).order_by(
+                "created_at"
+            )
+        ]
+
+    def test_collapse_noops(self):
+        self.assertEqual(collapse_noops(), 10)
+        self.assertEqual(self.names(self.summoners[0]), ["Player0", "Renamed"])
+        self.assertEqual(self.names(self.summoners[1]), ["Player1", "Renamed"])
+
+    def test_prune_by_age(self):
+        self.assertEqual(prune_by_age(60, now=self.now), 10)
+        self.assertFalse(
+            Change.objects.filter(created_at__lt=self.now - timedelta(days=60)).exists()
+        )
+
+    def test_prune_per_object(self):
+        newest = list(
+            Change.objects.filter(object_id=self.summoners[0].pk).order_by(
+                "-created_at"
+            )[:3]
+        )
+        self.assertEqual(prune_per_object(3), 8)
+        self.assertEqual(
+            list(
+                Change.objects.filter(object_id=self.summoners[0].pk).order_by(
+                    "-created_at"
+                )
+            ),
+            newest,
+        )
+
+    def test_compact_limits_are_optional(self):
+        self.assertEqual(compact(), {"noops": 10, "expired": 0, "excess": 0})
+        self.assertEqual(Change.objects.count(), 4)
+
+    @skipIf(connection.vendor == "postgresql", "partitions on PostgreSQL")
+    def test_not_partitioned_outside_postgres(self):
+        self.assertFalse(is_partitioned())
+
+    @skipIf(connection.vendor == "postgresql", "partitions on PostgreSQL")
+    @patch("scripts.partition_changes.print", create=True)
+    def test_partition_script_needs_postgres(self, mock_print):
+        from scripts.partition_changes import run
+
+        self.assertFalse(run())
+        mock_print.assert_called_once_with("Partitioning needs PostgreSQL")
+
+    def test_month_arithmetic(self):
+        self.assertEqual(month_start(date(2024, 11, 15), 2), date(2025, 1, 1))
+        self.assertEqual(month_start(date(2024, 1, 31), -1), date(2023, 12, 1))
+        self.assertEqual(partition_name(date(2024, 3, 1)), "change_change_y2024m03")
+
+
+@skipUnless(connection.vendor == "postgresql", "partitioning needs PostgreSQL")
+class TestChangePartitioning(TestChangeRetention):
+    # the retention tests again, on the partitioned table
+    def setUp(self):
+        super().setUp()
+        self.schema = self.introspect()
+        self.rows = list(Change.objects.order_by("pk").values())
+        partition_table()
+
+    def introspect(self):
+        with connection.cursor() as cursor:
+            return {
+                name: (info["columns"], info["index"], info["foreign_key"])
+                for name, info in connection.introspection.get_constraints(
+                    cursor, Change._meta.db_table
+                ).items()
+                if not info["primary_key"]
+            }
+
+    def test_partitioned_in_place(self):
+        self.assertTrue(is_partitioned())
+        self.assertEqual(list(Change.objects.order_by("pk").values()), self.rows)
+        # same index and foreign key names as the migrations created
+        self.assertEqual(self.introspect(), self.schema)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_inherits WHERE inhparent = %s::regclass",
+                [Change._meta.db_table],
+            )
+            # the default partition and at least the months of the history
+            self.assertGreaterEqual(cursor.fetchone()[0], 4)
+
+    def test_new_rows_after_partitioning(self):
+        last = Change.objects.order_by("pk").last()
+        self.summoners[0].name = "After"
+        self.summoners[0].save()
+        change = Change.objects.order_by("pk").last()
+        self.assertGreater(change.pk, last.pk)
+        self.assertEqual(change.changes, {"name": "Renamed"})
+
+    def test_ensure_partitions(self):
+        ensure_partitions(months_ahead=3)
+        month = month_start(date.today(), 3)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [partition_name(month)])
+            self.assertIsNotNone(cursor.fetchone()[0])
+
+
+class TestChangeFieldHistory(TestCase):
+    def setUp(self):
+        self.summoners = [
+            Summoner.objects.create(
+                name=f"Player{i}",
+                summoner_id=f"sum{i}",
+                account_id=f"acc{i}",
+                puu_id=f"puu_history_{i}",
+            )
+            for i in range(2)
+        ]
+        for name in ["Second", "Third"]:
+            self.summoners[0].name = name
+            self.summoners[0].save()
+        self.summoners[0].summoner_id = "sum_new"
+        self.summoners[0].save()
+        self.summoners[1].name = "Other"
+        self.summoners[1].save()
+
+    def test_name_changes_for_puuid(self):
+        with self.assertNumQueries(1):
+            history = list(Change.field_history("name", puu_id="puu_history_0"))
+        self.assertEqual(
+            [(old, new) for created_at, old, new in history],
+            [(None, "Player0"), ("Player0", "Second"), ("Second", "Third")],
+        )
+
+    def test_stored_as_native_json(self):
+        change = Change.objects.filter(object_id=self.summoners[1].pk).last()
+        self.assertEqual(change.changes, {"name": "Player1"})
+        self.assertTrue(
+            Change.objects.filter(new_object__summoner_id="sum_new").exists()
+        )
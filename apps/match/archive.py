@@ -0,0 +1,185 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+from functools import lru_cache
+from pathlib import Path
+import fcntl
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+
+class FlatJsonArchive:
+    # the original layout, one <match_id>.json per game in a single directory
+    legacy = None
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, match_id):
+        return self.root / f"{match_id}.json"
+
+    def contains(self, match_id):
+        return self.path(match_id).exists()
+
+    def exists(self, match_id):
+        return self.contains(match_id) or bool(
+            self.legacy and self.legacy.contains(match_id)
+        )
+
+    def read(self, match_id):
+        # fall back to payloads that haven't been converted yet
+        if self.legacy and not self.contains(match_id) and self.legacy.exists(match_id):
+            return self.legacy.read(match_id)
+        return json.loads(self.decode(self.get(match_id)))
+
+    def write(self, match_id, match):
+        self.put(match_id, self.encode(json.dumps(match).encode("utf-8")))
+
+    def scan(self):
+        for match_id in self.match_ids():
+            yield match_id, self.read(match_id)
+
+    def get(self, match_id):
+        with open(self.path(match_id), "rb") as f:
+            return f.read()
+
+    def put(self, match_id, raw):
+        path = self.path(match_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temp file first so readers never see half a payload
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+
+    def match_ids(self):
+        for path in self.root.glob("*.json"):
+            yield path.name[: -len(".json")]
+
+    def encode(self, raw):
+        return raw
+
+    def decode(self, raw):
+        return raw
+
+
+class CompressedArchive(FlatJsonArchive):
+    def __init__(self, root, level=6):
+        super().__init__(root)
+        self.level = level
+        self.legacy = FlatJsonArchive(root)
+
+    def encode(self, raw):
+        return gzip.compress(raw, compresslevel=self.level)
+
+    def decode(self, raw):
+        return gzip.decompress(raw)
+
+
+class ShardedGzipArchive(CompressedArchive):
+    # <root>/ab/cd/<match_id>.json.gz, sharded on a hash of the match id
+    def path(self, match_id):
+        digest = hashlib.sha1(match_id.encode("utf-8")).hexdigest()
+        return self.root / digest[:2] / digest[2:4] / f"{match_id}.json.gz"
+
+    def match_ids(self):
+        for path in self.root.glob("*/*/*.json.gz"):
+            yield path.name[: -len(".json.gz")]
+
+
+# match id, offset in the pack file, length
+INDEX_ENTRY = struct.Struct("<24sQI")
+
+
+class PackedArchive(CompressedArchive):
+    # every payload appended to <root>/matches.pack, located through the
+    # fixed size entries in <root>/matches.idx and read from a memory map
+    def __init__(self, root, level=6):
+        super().__init__(root, level)
+        self.pack_path = self.root / "matches.pack"
+        self.index_path = self.root / "matches.idx"
+        self.lock = threading.Lock()
+        self.index = {}
+        self.index_size = 0
+        self.map = None
+
+    def refresh(self):
+        # pick up entries appended since, also by other processes
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self.index_size)
+            data = f.read()
+        data = data[: len(data) - len(data) % INDEX_ENTRY.size]
+        for match_id, offset, length in INDEX_ENTRY.iter_unpack(data):
+            self.index[match_id.rstrip(b"\0").decode("ascii")] = (offset, length)
+        self.index_size += len(data)
+
+    def locate(self, match_id):
+        with self.lock:
+            if match_id not in self.index:
+                self.refresh()
+            return self.index.get(match_id)
+
+    def contains(self, match_id):
+        return self.locate(match_id) is not None
+
+    def get(self, match_id):
+        entry = self.locate(match_id)
+        if not entry:
+            raise FileNotFoundError(f"{match_id} not in {self.pack_path}")
+        offset, length = entry
+        with self.lock:
+            if self.map is None or offset + length > len(self.map):
+                # the old map is released once no views on it are left
+                with open(self.pack_path, "rb") as f:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self.map)[offset : offset + length]
+
+    def put(self, match_id, raw):
+        key = match_id.encode("ascii")
+        if len(key) > INDEX_ENTRY.size - 12:
+            raise ValueError(f"Match id too long for the pack index: {match_id}")
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.pack_path, "ab") as pack, open(self.index_path, "ab") as index:
+            fcntl.flock(pack, fcntl.LOCK_EX)
+            try:
+                offset = pack.seek(0, os.SEEK_END)
+                pack.write(raw)
+                pack.flush()
+                index.write(INDEX_ENTRY.pack(key, offset, len(raw)))
+                index.flush()
+            finally:
+                fcntl.flock(pack, fcntl.LOCK_UN)
+
+    def match_ids(self):
+        with self.lock:
+            self.refresh()
+            return list(self.index)
+
+    def scan(self):
+        # in file order, so a full pass is one sequential read of the pack
+        with self.lock:
+            self.refresh()
+            entries = sorted(self.index.items(), key=lambda entry: entry[1][0])
+        for match_id, entry in entries:
+            yield match_id, json.loads(self.decode(self.get(match_id)))
+
+
+@lru_cache(maxsize=None)
+def get_archive():
+    return import_string(settings.MATCH_ARCHIVE_BACKEND)(settings.MATCH_ARCHIVE_ROOT)
+
+
+def reset_archive(setting, **kwargs):
+    if setting in ("MATCH_ARCHIVE_BACKEND", "MATCH_ARCHIVE_ROOT"):
+        get_archive.cache_clear()
+
+
+setting_changed.connect(reset_archive)
@@ -0,0 +1,102 @@
+from apps.match.archive import get_archive
+from apps.match.models import Match
+from apps.match.payload import MatchPayload
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import os
+import time
+
+
+def extract(rows, attributes):
+    # runs in a worker process, rows are (pk, match_id, puuid) tuples. sorted
+    # by match id so a game is read and parsed once for all the tracked
+    # participants in this chunk
+    archive = get_archive()
+    updates = []
+    missing = []
+    payload = payload_id = None
+    for pk, match_id, puuid in sorted(rows, key=lambda row: row[1]):
+        if payload_id != match_id:
+            payload_id = match_id
+            try:
+                payload = MatchPayload(archive.read(match_id))
+            except FileNotFoundError:
+                payload = None
+        if not payload or not payload.participant(puuid):
+            missing.append((pk, match_id))
+            continue
+        updates.append(
+            (
+                pk,
+                {
+                    field: payload.stat(puuid, name, challenges)
+                    for field, name, challenges in attributes
+                },
+            )
+        )
+    return updates, missing
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def backfill(attributes, workers=None, chunk_size=500, start_after=0):
+    # attributes are (field, name, challenges) tuples, all filled in one pass.
+    # progress is reported with the last pk written, pass it as start_after to
+    # resume an interrupted run
+    workers = workers or os.cpu_count()
+    fields = [field for field, name, challenges in attributes]
+    queryset = Match.objects.filter(pk__gt=start_after).order_by("pk")
+    total = queryset.count()
+    done = updated = 0
+    last_pk = start_after
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        rows = chunks(
+            queryset.values_list("pk", "match_id", "summoner__puu_id").iterator(
+                chunk_size=chunk_size
+            ),
+            chunk_size,
+        )
+        pending = deque()
+        # chunks are written in order so last_pk is always safe to resume from
+        for chunk in rows:
+            pending.append((chunk, executor.submit(extract, chunk, attributes)))
+            if len(pending) < workers * 2:
+                continue
+            done, updated, last_pk = write_chunk(
+                fields, *pending.popleft(), done, updated
+            )
+            report(done, updated, total, last_pk, start)
+        while pending:
+            done, updated, last_pk = write_chunk(
+                fields, *pending.popleft(), done, updated
+            )
+            report(done, updated, total, last_pk, start)
+    return updated
+
+
+def write_chunk(fields, chunk, future, done, updated):
+    updates, missing = future.result()
+    Match.objects.bulk_update(
+        [Match(pk=pk, **values) for pk, values in updates], fields
+    )
+    for pk, match_id in missing:
+        print(f"not found, {match_id} (match {pk})")
+    return done + len(chunk), updated + len(updates), chunk[-1][0]
+
+
+def report(done, updated, total, last_pk, start):
+    elapsed = time.monotonic() - start
+    print(
+        f"{done}/{total} matches, {updated} updated in {elapsed:.1f}s, "
+        f"resume after pk {last_pk}"
+    )
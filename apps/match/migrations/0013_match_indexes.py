@@ -0,0 +1,25 @@
+# Generated by Django 4.2.29 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("match", "0012_remove_promos_neither"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="match",
+            index=models.Index(
+                fields=["summoner", "start_time"], name="match_match_summone_746e2f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="match",
+            index=models.Index(
+                fields=["match_id"], name="match_match_match_i_c98619_idx"
+            ),
+        ),
+    ]
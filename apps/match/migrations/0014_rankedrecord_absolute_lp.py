@@ -0,0 +1,37 @@
+# Generated by Django 4.2.29 on 2026-10-18 13:20
+
+from django.db import migrations, models
+from django.db.models import Case, F, When
+
+
+def fill_absolute_lp(apps, schema_editor):
+    RankedRecord = apps.get_model("match", "RankedRecord")
+    # RankedRecord.absolute_value, in a single UPDATE
+    RankedRecord.objects.update(
+        absolute_lp=Case(
+            When(tier__gt=5, then=F("tier") * 400 + F("lp")),
+            default=F("tier") * 400 + F("rank") * 100 + F("lp"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("match", "0013_match_indexes"),
+    ]
+
+    operations = [
+        # the index is added after the backfill, so it's built once
+        migrations.AddField(
+            model_name="rankedrecord",
+            name="absolute_lp",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_absolute_lp, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="rankedrecord",
+            name="absolute_lp",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -1,10 +1,13 @@
-from django.db import models
-import os
-import json
-from datetime import datetime, timezone
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import pre_save
 from imgflip_meme import generate_meme
-import time
+import threading
+from concurrent.futures import Future
 from riot_api import call_api
+from riot_api_async import fetch_matches
+from .payload import MatchPayload
+from .archive import get_archive
 
 
 class RiotAPIException(Exception):
@@ -19,6 +22,10 @@ class RiotEmptyResponseException(Exception):
         super(RiotEmptyResponseException, self).__init__(message)
 
 
+payload_lock = threading.Lock()
+payloads_in_flight = {}
+
+
 # Create your models here.
 class Match(models.Model):
     match_id = models.CharField(max_length=15)
@@ -46,6 +53,10 @@ class Match(models.Model):
 
     class Meta:
         ordering = ["start_time"]
+        indexes = [
+            models.Index(fields=["summoner", "start_time"]),
+            models.Index(fields=["match_id"]),
+        ]
 
     def __str__(self):
         return f"Match {self.match_id} for {self.summoner.name}"
@@ -109,37 +120,29 @@ class Match(models.Model):
         return event_list
 
     @staticmethod
-    def update_all_new_attributes(field, name, challenges=False):
-        for match in Match.objects.all():
-            time.sleep(0.2)
-            val = match.update_new_attribute(field, name, challenges)
-            if not val:
-                print(f"not found, {match.match_id} {match.summoner.name}")
-
-    def update_new_attribute(self, field, name, challenges=False):
-        loaded = Match.read(self.match_id)
-
-        for player in loaded.get("info").get("participants"):
-            if player.get("puuid") == self.summoner.puu_id:
-                if challenges:
-                    value = player.get("challenges").get(name)
-                else:
-                    value = player.get(name)
-                setattr(self, field, value)
-                self.save()
-                return True
-        return False
+    def update_all_new_attributes(field, name, challenges=False, **kwargs):
+        # imported here as the backfill module imports this one
+        from .backfill import backfill
+
+        return backfill([(field, name, challenges)], **kwargs)
+
+    def update_new_attribute(self, field, name, challenges=False, payload=None):
+        payload = payload or Match.load(self.match_id)
+        if not payload.participant(self.summoner.puu_id):
+            return False
+        setattr(self, field, payload.stat(self.summoner.puu_id, name, challenges))
+        self.save()
+        return True
 
     def restore_puuid(self):
         match_req = call_api(
             f"https://europe.api.riotgames.com/lol/match/v5/matches/{self.match_id}"
         )
-        if (
-            match_req.status_code == 200
-            and match_req.json().get("info").get("queueId") == 420
-        ):
-            match_data = match_req.json()
-            Match.write(self.match_id, match_data)
+        payload = None
+        if match_req.status_code == 200:
+            payload = MatchPayload.from_response(match_req)
+        if payload and payload.queue_id == 420:
+            Match.write(self.match_id, payload.data)
             print(f"Updated {self.match_id}")
         else:
             raise RiotAPIException(
@@ -147,54 +150,101 @@ class Match(models.Model):
             )
 
     @staticmethod
-    def create_match(match_id, summoner):
-        match_req = call_api(
-            f"https://europe.api.riotgames.com/lol/match/v5/matches/{match_id}"
-        )
-        if (
-            match_req.status_code == 200
-            and match_req.json().get("info").get("queueId") == 420
-        ):
-            match_data = match_req.json()
-            for participant in match_data.get("info").get("participants"):
-                if participant.get("puuid") == summoner.puu_id:
-                    match = Match(
-                        match_id=match_id,
-                        summoner=summoner,
-                        champion_name=participant.get("championName"),
-                        penta_kills=participant.get("pentaKills"),
-                        quadra_kills=participant.get("quadraKills"),
-                        triple_kills=participant.get("tripleKills"),
-                        epic_steals=participant.get("challenges").get(
-                            "epicMonsterSteals"
-                        ),
-                        kills=participant.get("kills"),
-                        deaths=participant.get("deaths"),
-                        assists=participant.get("assists"),
-                        kda=participant.get("challenges").get("kda"),
-                        start_time=datetime.fromtimestamp(
-                            match_req.json().get("info").get("gameStartTimestamp")
-                            / 1e3,
-                            timezone.utc,
-                        ),
-                        duration=match_req.json().get("info").get("gameDuration"),
-                        win=participant.get("win"),
-                        vision_wards_bought=participant.get("visionWardsBoughtInGame"),
-                        wards_placed=participant.get("wardsPlaced"),
-                        vision_score=participant.get("visionScore"),
-                        longest_time_spent_living=participant.get(
-                            "longestTimeSpentLiving"
-                        ),
-                        first_blood_kill=participant.get("firstBloodKill"),
-                        first_blood_assist=participant.get("firstBloodAssist"),
-                        first_tower_kill=participant.get("firstTowerKill"),
-                        first_tower_assist=participant.get("firstTowerAssist"),
+    def fetch_payloads(match_ids):
+        # one download and write per game, also when several tracked
+        # summoners from the same game are polled at the same time
+        owned = []
+        futures = {}
+        with payload_lock:
+            for match_id in match_ids:
+                if match_id not in payloads_in_flight:
+                    payloads_in_flight[match_id] = Future()
+                    owned.append(match_id)
+                futures[match_id] = payloads_in_flight[match_id]
+
+        try:
+            missing = []
+            for match_id in owned:
+                if Match.is_stored(match_id):
+                    futures[match_id].set_result(Match.load(match_id))
+                else:
+                    missing.append(match_id)
+            if len(missing) == 1:
+                match_reqs = [
+                    call_api(
+                        f"https://europe.api.riotgames.com/lol/match/v5/matches/{missing[0]}"
                     )
-                    match.save()
-                    Match.write(match_id, match_data)
-                    return match
-        else:
-            raise RiotAPIException(f"Failed to create match: {match_req.json()}")
+                ]
+            else:
+                match_reqs = fetch_matches(missing) if missing else []
+            for match_id, match_req in zip(missing, match_reqs):
+                payload = None
+                if match_req.status_code == 200:
+                    payload = MatchPayload.from_response(match_req)
+                if payload and payload.queue_id == 420:
+                    Match.write(match_id, payload.data)
+                    futures[match_id].set_result(payload)
+                else:
+                    futures[match_id].set_exception(
+                        RiotAPIException(f"Failed to create match: {match_req.json()}")
+                    )
+        except Exception as e:
+            for match_id in owned:
+                if not futures[match_id].done():
+                    futures[match_id].set_exception(e)
+        finally:
+            # once written, later polls find the payload on disk
+            with payload_lock:
+                for match_id in owned:
+                    payloads_in_flight.pop(match_id, None)
+        return [futures[match_id].result() for match_id in match_ids]
+
+    @staticmethod
+    def create_match(match_id, summoner, payload=None):
+        if payload is None:
+            payload = Match.fetch_payloads([match_id])[0]
+        participant = payload.participant(summoner.puu_id)
+        if not participant:
+            return None
+        match = Match(
+            match_id=match_id,
+            summoner=summoner,
+            champion_name=participant.get("championName"),
+            penta_kills=participant.get("pentaKills"),
+            quadra_kills=participant.get("quadraKills"),
+            triple_kills=participant.get("tripleKills"),
+            epic_steals=participant.get("challenges").get("epicMonsterSteals"),
+            kills=participant.get("kills"),
+            deaths=participant.get("deaths"),
+            assists=participant.get("assists"),
+            kda=participant.get("challenges").get("kda"),
+            start_time=payload.start_time,
+            duration=payload.duration,
+            win=participant.get("win"),
+            vision_wards_bought=participant.get("visionWardsBoughtInGame"),
+            wards_placed=participant.get("wardsPlaced"),
+            vision_score=participant.get("visionScore"),
+            longest_time_spent_living=participant.get("longestTimeSpentLiving"),
+            first_blood_kill=participant.get("firstBloodKill"),
+            first_blood_assist=participant.get("firstBloodAssist"),
+            first_tower_kill=participant.get("firstTowerKill"),
+            first_tower_assist=participant.get("firstTowerAssist"),
+        )
+        match.save()
+        return match
+
+    @staticmethod
+    def newest_first(queryset, cursor=None):
+        # keyset pagination on (start_time, pk), walks the summoner/start_time
+        # index instead of counting past an offset. cursor is the
+        # (start_time, pk) of the last match on the previous page
+        queryset = queryset.order_by("-start_time", "-pk")
+        if cursor:
+            start_time, pk = cursor
+            queryset = queryset.filter(
+                Q(start_time__lt=start_time) | Q(start_time=start_time, pk__lt=pk)
+            )
+        return queryset
 
     @staticmethod
     def find_last_ranked(summoner):
@@ -209,19 +259,19 @@ class Match(models.Model):
 
     @staticmethod
     def write(match_id, match):
-        os.makedirs("matches", exist_ok=True)
+        get_archive().write(match_id, match)
+
+    @staticmethod
+    def is_stored(match_id):
+        return get_archive().exists(match_id)
 
-        with open(f"{os.getcwd()}/matches/{match_id}.json", "w") as f:
-            f.write(json.dumps(match))
-            f.close()
+    @staticmethod
+    def load(match_id):
+        return MatchPayload(Match.read(match_id))
 
     @staticmethod
     def read(match_id):
-        os.makedirs("matches", exist_ok=True)
-        with open(f"{os.getcwd()}/matches/{match_id}.json", "r") as f:
-            match = json.load(f)
-            f.close()
-            return match
+        return get_archive().read(match_id)
 
 
 class Promos(models.Model):
@@ -267,6 +317,8 @@ class RankedRecord(models.Model):
     promo = models.OneToOneField(
         Promos, on_delete=models.CASCADE, null=True, default=None
     )
+    # absolute_value(), stored for ordering and range filters in the database
+    absolute_lp = models.IntegerField(default=0, db_index=True)
 
     def __eq__(self, other):
         return (
@@ -329,22 +381,41 @@ class RankedRecord(models.Model):
 
     @staticmethod
     def create_record(summoner, match, ranked):
-        promo = None
-        if ranked.get("miniSeries"):
-            promo = Promos.objects.create(
-                target=ranked.get("miniSeries").get("target"),
-                wins=ranked.get("miniSeries").get("wins"),
-                losses=ranked.get("miniSeries").get("losses"),
-                progress=ranked.get("miniSeries").get("progress"),
+        with transaction.atomic():
+            promo = None
+            if ranked.get("miniSeries"):
+                promo = Promos.objects.create(
+                    target=ranked.get("miniSeries").get("target"),
+                    wins=ranked.get("miniSeries").get("wins"),
+                    losses=ranked.get("miniSeries").get("losses"),
+                    progress=ranked.get("miniSeries").get("progress"),
+                )
+            record = RankedRecord.objects.create(
+                tier=RankedRecord.tier_to_int(ranked.get("tier")),
+                rank=RankedRecord.rank_to_int(ranked.get("rank")),
+                lp=ranked.get("leaguePoints"),
+                summoner=summoner,
+                match=match,
+                promo=promo,
             )
-        RankedRecord.objects.create(
-            tier=RankedRecord.tier_to_int(ranked.get("tier")),
-            rank=RankedRecord.rank_to_int(ranked.get("rank")),
-            lp=ranked.get("leaguePoints"),
-            summoner=summoner,
-            match=match,
-            promo=promo,
-        )
+            summoner.set_current_rank(record)
+        return record
+
+    def to_ranked(self):
+        # same shape as a league-v4 entry, as accepted by create_record
+        ranked = {
+            "tier": RankedRecord.int_to_tier(self.tier),
+            "rank": RankedRecord.int_to_rank(self.rank),
+            "leaguePoints": self.lp,
+        }
+        if self.promo:
+            ranked["miniSeries"] = {
+                "target": self.promo.target,
+                "wins": self.promo.wins,
+                "losses": self.promo.losses,
+                "progress": self.promo.progress,
+            }
+        return ranked
 
     def absolute_value(self):
         if self.tier > 5:
@@ -418,3 +489,10 @@ class RankedRecord(models.Model):
             return "II"
         if rank == 3:
             return "I"
+
+    @staticmethod
+    def on_save(sender, instance, **kwargs):
+        instance.absolute_lp = instance.absolute_value()
+
+
+pre_save.connect(RankedRecord.on_save, sender=RankedRecord)
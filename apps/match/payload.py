@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+
+
+class MatchPayload:
+    def __init__(self, data):
+        self.data = data
+        self.info = data.get("info")
+        self.participants = {
+            participant.get("puuid"): participant
+            for participant in self.info.get("participants")
+        }
+
+    @staticmethod
+    def from_response(match_req):
+        return MatchPayload(match_req.json())
+
+    @property
+    def queue_id(self):
+        return self.info.get("queueId")
+
+    @property
+    def start_time(self):
+        return datetime.fromtimestamp(
+            self.info.get("gameStartTimestamp") / 1e3, timezone.utc
+        )
+
+    @property
+    def duration(self):
+        return self.info.get("gameDuration")
+
+    def participant(self, puuid):
+        return self.participants.get(puuid)
+
+    def stat(self, puuid, name, challenges=False):
+        participant = self.participants.get(puuid)
+        if challenges:
+            return participant.get("challenges").get(name)
+        return participant.get(name)
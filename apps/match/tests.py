@@ -1,10 +1,16 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest.mock import patch, MagicMock
 from apps.match.models import Match, Promos, RankedRecord
+from apps.match.payload import MatchPayload
+from apps.match.archive import get_archive, PackedArchive
+from apps.match.backfill import backfill, extract
 from apps.summoner.models import Summoner
 from datetime import datetime, timezone
+import gzip
 import json
 import os
+import tempfile
+import threading
 
 
 class TestPromos(TestCase):
@@ -118,6 +124,35 @@ class TestRankedRecordAbsoluteValue(TestCase):
         self.assertEqual(r.absolute_value(), 3000)
 
 
+class TestRankedRecordAbsoluteLp(TestCase):
+    def setUp(self):
+        self.summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_absolute_lp",
+        )
+
+    def test_stored_on_save(self):
+        record = RankedRecord.objects.create(tier=3, rank=2, lp=50, summoner=self.summoner)
+        self.assertEqual(record.absolute_lp, record.absolute_value())
+        record.tier = 7
+        record.save()
+        record.refresh_from_db()
+        self.assertEqual(record.absolute_lp, 2850)
+
+    def test_ordering_and_range_in_database(self):
+        for tier, rank, lp in [(2, 3, 90), (7, 0, 10), (3, 0, 0), (3, 3, 99)]:
+            RankedRecord.objects.create(tier=tier, rank=rank, lp=lp, summoner=self.summoner)
+        gold_plus = RankedRecord.objects.filter(
+            absolute_lp__gte=RankedRecord.tier_to_int("GOLD") * 400
+        ).order_by("-absolute_lp")
+        self.assertEqual(
+            [(record.tier, record.rank, record.lp) for record in gold_plus],
+            [(7, 0, 10), (3, 3, 99), (3, 0, 0)],
+        )
+
+
 class TestRankedRecordTrend(TestCase):
     def test_positive_trend_near_promotion(self):
         current = RankedRecord(tier=3, rank=2, lp=90)
@@ -390,17 +425,79 @@ class TestMatchStr(TestCase):
 
 
 class TestMatchWriteRead(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        settings_patch = override_settings(MATCH_ARCHIVE_ROOT=self.root)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+
     def test_write_and_read(self):
         match_data = {"info": {"participants": [{"kills": 5}]}}
         Match.write("TEST_MATCH_001", match_data)
 
         result = Match.read("TEST_MATCH_001")
         self.assertEqual(result, match_data)
+        self.assertTrue(Match.is_stored("TEST_MATCH_001"))
+
+    def test_stored_compressed_and_sharded(self):
+        Match.write("TEST_MATCH_002", {"info": {}})
+        path = get_archive().path("TEST_MATCH_002")
+        self.assertEqual(path.name, "TEST_MATCH_002.json.gz")
+        self.assertEqual(len(path.relative_to(self.root).parts), 3)
+        with gzip.open(path) as f:
+            self.assertEqual(json.load(f), {"info": {}})
+
+    def test_reads_legacy_flat_file(self):
+        with open(os.path.join(self.root, "TEST_MATCH_003.json"), "w") as f:
+            json.dump({"info": {"queueId": 420}}, f)
+        self.assertTrue(Match.is_stored("TEST_MATCH_003"))
+        self.assertEqual(Match.read("TEST_MATCH_003"), {"info": {"queueId": 420}})
+
+    def test_missing(self):
+        self.assertFalse(Match.is_stored("TEST_MATCH_MISSING"))
 
-        # Clean up
-        path = f"{os.getcwd()}/matches/TEST_MATCH_001.json"
-        if os.path.exists(path):
-            os.remove(path)
+
+class TestPackedArchive(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.archive = PackedArchive(self.root)
+
+    def test_write_and_read(self):
+        self.archive.write("EUW1_1", {"info": {"gameId": 1}})
+        self.archive.write("EUW1_2", {"info": {"gameId": 2}})
+        self.assertEqual(self.archive.read("EUW1_1"), {"info": {"gameId": 1}})
+        self.assertEqual(self.archive.read("EUW1_2"), {"info": {"gameId": 2}})
+        self.assertEqual(sorted(os.listdir(self.root)), ["matches.idx", "matches.pack"])
+
+    def test_index_read_by_other_instance(self):
+        self.archive.write("EUW1_1", {"info": {"gameId": 1}})
+        other = PackedArchive(self.root)
+        self.assertTrue(other.exists("EUW1_1"))
+        self.archive.write("EUW1_2", {"info": {"gameId": 2}})
+        self.assertEqual(other.read("EUW1_2"), {"info": {"gameId": 2}})
+
+    def test_scan_in_write_order(self):
+        for i in range(3):
+            self.archive.write(f"EUW1_{i}", {"info": {"gameId": i}})
+        scanned = list(self.archive.scan())
+        self.assertEqual([m for m, _ in scanned], ["EUW1_0", "EUW1_1", "EUW1_2"])
+        self.assertEqual(scanned[2][1], {"info": {"gameId": 2}})
+
+    def test_missing_raises(self):
+        self.assertFalse(self.archive.exists("EUW1_MISSING"))
+        with self.assertRaises(FileNotFoundError):
+            self.archive.read("EUW1_MISSING")
+
+    def test_reads_legacy_flat_file(self):
+        with open(os.path.join(self.root, "EUW1_OLD.json"), "w") as f:
+            json.dump({"info": {"queueId": 420}}, f)
+        self.assertTrue(self.archive.exists("EUW1_OLD"))
+        self.assertFalse(self.archive.contains("EUW1_OLD"))
+        self.assertEqual(self.archive.read("EUW1_OLD"), {"info": {"queueId": 420}})
 
 
 class TestMatchCreateMatch(TestCase):
@@ -452,6 +549,7 @@ class TestMatchCreateMatch(TestCase):
             match = Match.create_match("EUW1_CREATE", summoner)
 
         self.assertIsNotNone(match)
+        mock_resp.json.assert_called_once()
         self.assertEqual(match.match_id, "EUW1_CREATE")
         self.assertEqual(match.champion_name, "Ahri")
         self.assertEqual(match.kills, 5)
@@ -476,6 +574,43 @@ class TestMatchCreateMatch(TestCase):
             Match.create_match("EUW1_ERR", summoner)
 
 
+class TestMatchNewestFirst(TestCase):
+    def setUp(self):
+        self.summoner = Summoner.objects.create(name="Test Player", puu_id="puu_pages")
+        same = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        for match_id, start_time in [
+            ("EUW1_1", datetime(2024, 1, 1, tzinfo=timezone.utc)),
+            ("EUW1_2", same),
+            ("EUW1_3", same),
+            ("EUW1_4", datetime(2024, 1, 3, tzinfo=timezone.utc)),
+        ]:
+            Match.objects.create(
+                match_id=match_id, summoner=self.summoner, start_time=start_time
+            )
+
+    def pages(self, size):
+        pages = []
+        cursor = None
+        while True:
+            rows = list(
+                Match.newest_first(Match.objects.all(), cursor).values_list(
+                    "start_time", "pk", "match_id"
+                )[:size]
+            )
+            if not rows:
+                return pages
+            pages.append([match_id for start_time, pk, match_id in rows])
+            cursor = rows[-1][:2]
+
+    def test_pages_cover_every_match_once(self):
+        self.assertEqual(self.pages(2), [["EUW1_4", "EUW1_3"], ["EUW1_2", "EUW1_1"]])
+        # a page boundary between two games with the same start time
+        self.assertEqual(
+            self.pages(3), [["EUW1_4", "EUW1_3", "EUW1_2"], ["EUW1_1"]]
+        )
+        self.assertEqual(self.pages(1), [["EUW1_4"], ["EUW1_3"], ["EUW1_2"], ["EUW1_1"]])
+
+
 class TestMatchFindLastRanked(TestCase):
     @patch("apps.match.models.call_api")
     def test_finds_last_ranked(self, mock_call_api):
@@ -510,3 +645,243 @@ class TestMatchFindLastRanked(TestCase):
 
         with self.assertRaises(RiotAPIException):
             Match.find_last_ranked(summoner)
+
+
+class CountingLock:
+    def __init__(self, target):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.target = target
+        self.reached = threading.Event()
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.count += 1
+        if self.count == self.target:
+            self.reached.set()
+
+    def __exit__(self, *args):
+        self.lock.release()
+
+
+class TestMatchFetchPayloads(TestCase):
+    def _match_resp(self):
+        resp = MagicMock()
+        resp.status_code = 200
+        resp.json.return_value = {"info": {"queueId": 420, "participants": []}}
+        return resp
+
+    @patch("apps.match.models.call_api")
+    def test_stored_payload_not_downloaded(self, mock_call_api):
+        payload = {"info": {"queueId": 420, "participants": []}}
+        with patch.object(Match, "is_stored", return_value=True), patch.object(
+            Match, "read", return_value=payload
+        ):
+            result = Match.fetch_payloads(["EUW1_STORED"])
+        self.assertEqual(result[0].data, payload)
+        mock_call_api.assert_not_called()
+
+    @patch("apps.match.models.call_api")
+    def test_concurrent_polls_download_once(self, mock_call_api):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_call(url):
+            started.set()
+            release.wait(5)
+            return self._match_resp()
+
+        mock_call_api.side_effect = slow_call
+        # the second poll registers for the payload before the download ends
+        lock = CountingLock(2)
+        results = []
+        with patch("apps.match.models.payload_lock", lock), patch.object(
+            Match, "write"
+        ) as mock_write:
+            first = threading.Thread(
+                target=lambda: results.append(Match.fetch_payloads(["EUW1_SHARED"]))
+            )
+            first.start()
+            started.wait(5)
+            second = threading.Thread(
+                target=lambda: results.append(Match.fetch_payloads(["EUW1_SHARED"]))
+            )
+            second.start()
+            lock.reached.wait(5)
+            release.set()
+            first.join(5)
+            second.join(5)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], results[1])
+        mock_call_api.assert_called_once()
+        mock_write.assert_called_once()
+
+    @patch("apps.match.models.fetch_matches")
+    def test_multiple_missing_fetched_together(self, mock_fetch):
+        mock_fetch.return_value = [self._match_resp(), self._match_resp()]
+        with patch.object(Match, "write") as mock_write:
+            result = Match.fetch_payloads(["EUW1_A", "EUW1_B"])
+        self.assertEqual(len(result), 2)
+        mock_fetch.assert_called_once_with(["EUW1_A", "EUW1_B"])
+        self.assertEqual(mock_write.call_count, 2)
+
+
+class TestMatchPayload(TestCase):
+    def setUp(self):
+        self.payload = MatchPayload(
+            {
+                "info": {
+                    "queueId": 420,
+                    "gameStartTimestamp": 1704067200000,
+                    "gameDuration": 1800,
+                    "participants": [
+                        {"puuid": "puu_a", "kills": 3, "challenges": {"kda": 2.5}},
+                        {"puuid": "puu_b", "kills": 7, "challenges": {"kda": 5.0}},
+                    ],
+                }
+            }
+        )
+
+    def test_accessors(self):
+        self.assertEqual(self.payload.queue_id, 420)
+        self.assertEqual(self.payload.duration, 1800)
+        self.assertEqual(
+            self.payload.start_time, datetime(2024, 1, 1, tzinfo=timezone.utc)
+        )
+
+    def test_participant_index(self):
+        self.assertEqual(self.payload.participant("puu_b").get("kills"), 7)
+        self.assertIsNone(self.payload.participant("puu_missing"))
+
+    def test_stat(self):
+        self.assertEqual(self.payload.stat("puu_a", "kills"), 3)
+        self.assertEqual(self.payload.stat("puu_a", "kda", challenges=True), 2.5)
+
+    def test_update_new_attribute_with_payload(self):
+        summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_b",
+        )
+        match = Match.objects.create(
+            match_id="EUW1_PAYLOAD",
+            summoner=summoner,
+            champion_name="Ahri",
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+        with patch.object(Match, "read") as mock_read:
+            self.assertTrue(match.update_new_attribute("kills", "kills", payload=self.payload))
+        mock_read.assert_not_called()
+        match.refresh_from_db()
+        self.assertEqual(match.kills, 7)
+
+
+class TestBackfill(TestCase):
+    def setUp(self):
+        print_patch = patch("apps.match.backfill.print", create=True)
+        print_patch.start()
+        self.addCleanup(print_patch.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_patch = override_settings(MATCH_ARCHIVE_ROOT=tmp.name)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        self.summoners = [
+            Summoner.objects.create(
+                name=f"Player{i}",
+                summoner_id=f"sum{i}",
+                account_id=f"acc{i}",
+                puu_id=f"puu_backfill_{i}",
+            )
+            for i in range(2)
+        ]
+        participants = [
+            {"puuid": f"puu_backfill_{i}", "kills": 10 + i, "challenges": {"kda": 2.0 + i}}
+            for i in range(2)
+        ]
+        Match.write("EUW1_BF1", {"info": {"participants": participants}})
+        Match.write("EUW1_BF2", {"info": {"participants": participants[:1]}})
+        self.matches = [
+            self._match("EUW1_BF1", self.summoners[0]),
+            self._match("EUW1_BF1", self.summoners[1]),
+            self._match("EUW1_BF2", self.summoners[0]),
+            self._match("EUW1_MISSING", self.summoners[1]),
+        ]
+
+    def _match(self, match_id, summoner):
+        return Match.objects.create(
+            match_id=match_id,
+            summoner=summoner,
+            champion_name="Ahri",
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def test_multiple_fields_in_one_pass(self):
+        updated = backfill(
+            [("kills", "kills", False), ("kda", "kda", True)], workers=2, chunk_size=1
+        )
+
+        self.assertEqual(updated, 3)
+        values = [
+            Match.objects.values_list("kills", "kda").get(pk=m.pk) for m in self.matches
+        ]
+        self.assertEqual(values, [(10, 2.0), (11, 3.0), (10, 2.0), (0, 0)])
+
+    def test_resume_after_pk(self):
+        updated = backfill(
+            [("kills", "kills", False)], workers=1, start_after=self.matches[1].pk
+        )
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(Match.objects.get(pk=self.matches[0].pk).kills, 0)
+        self.assertEqual(Match.objects.get(pk=self.matches[2].pk).kills, 10)
+
+    def test_game_parsed_once_per_chunk(self):
+        rows = [
+            (m.pk, m.match_id, m.summoner.puu_id)
+            for m in [self.matches[0], self.matches[2], self.matches[1]]
+        ]
+        with patch("apps.match.backfill.MatchPayload", wraps=MatchPayload) as parse:
+            updates, missing = extract(rows, [("kills", "kills", False)])
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual(
+            sorted(updates),
+            [
+                (self.matches[0].pk, {"kills": 10}),
+                (self.matches[1].pk, {"kills": 11}),
+                (self.matches[2].pk, {"kills": 10}),
+            ],
+        )
+
+    def test_update_all_new_attributes(self):
+        Match.update_all_new_attributes("kills", "kills", workers=1)
+        self.assertEqual(Match.objects.get(pk=self.matches[1].pk).kills, 11)
+
+
+class TestBenchmarkMatchIndexes(TestCase):
+    @patch("scripts.benchmark_match_indexes.print", create=True)
+    def test_compares_and_rolls_back(self, mock_print):
+        from scripts.benchmark_match_indexes import compare
+
+        results = compare(500, 5, 2)
+        self.assertEqual(set(results), {"recent", "weekly", "last", "match_info"})
+        self.assertEqual(Match.objects.count(), 0)
+        self.assertEqual(Summoner.objects.count(), 0)
+        output = "\n".join(str(call.args[0]) for call in mock_print.call_args_list)
+        self.assertIn("match_match_match_i_c98619_idx", output)
+
+    @patch("scripts.benchmark_match_indexes.compare")
+    def test_runs_on_a_throwaway_database(self, mock_compare):
+        from django.db import connection
+        from scripts.benchmark_match_indexes import run
+
+        with patch.object(connection.creation, "create_test_db") as create, patch.object(
+            connection.creation, "destroy_test_db"
+        ) as destroy:
+            run(10, 2, 1)
+        create.assert_called_once()
+        mock_compare.assert_called_once_with(10, 2, 1)
+        destroy.assert_called_once_with(connection.settings_dict["NAME"], verbosity=0)
+
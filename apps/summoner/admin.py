@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Summoner
+from .models import DailyStats, RollingStats, Summoner
 
 admin.site.register(Summoner)
+admin.site.register(DailyStats)
+admin.site.register(RollingStats)
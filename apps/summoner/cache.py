@@ -0,0 +1,56 @@
+from apps.match.models import Match
+from django.core.cache import caches
+from urllib.parse import quote
+
+# responses are keyed on the summoner's newest match id, so ingesting a match
+# moves every command for that summoner onto fresh keys and the old entries
+# age out of the LRU. poll() stores that id as the summoner's latest-match
+# pointer, the cache has to be shared with the cron's process for the bot to
+# see it (file based by default, see settings.CACHES)
+
+
+def get_cache():
+    return caches["summoner"]
+
+
+def latest_key(name):
+    # quoted, summoner names can have spaces memcached won't take
+    return f"latest:{quote(name)}"
+
+
+def latest_match_id(name):
+    cache = get_cache()
+    match_id = cache.get(latest_key(name))
+    if match_id is None:
+        # not stored by poll() yet, or expired
+        match_id = (
+            Match.objects.filter(summoner__name=name)
+            .order_by("-start_time")
+            .values_list("match_id", flat=True)
+            .first()
+        )
+        if match_id:
+            # add rather than set, a newer id poll() stored meanwhile wins
+            cache.add(latest_key(name), match_id)
+    return match_id
+
+
+def cached(command, name, compute):
+    # compute produces the response, it isn't cached when it raises (unknown
+    # summoner, timeouts). Summoners without matches aren't cached either,
+    # their answer changes as soon as they're tracked
+    cache = get_cache()
+    match_id = latest_match_id(name)
+    if not match_id:
+        return compute()
+    key = f"{command}:{quote(name)}:{match_id}"
+    response = cache.get(key)
+    if response is None:
+        response = compute()
+        cache.set(key, response)
+    return response
+
+
+def invalidate(name, match_id):
+    # every cached response for the summoner is stale once this moves
+    get_cache().set(latest_key(name), match_id)
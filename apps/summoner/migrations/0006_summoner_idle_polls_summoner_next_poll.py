@@ -0,0 +1,23 @@
+# Generated by Django 4.2.29 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("summoner", "0005_summoner_bully_opt_in"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="summoner",
+            name="idle_polls",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="next_poll",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.29 on 2026-10-18 13:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("summoner", "0006_summoner_idle_polls_summoner_next_poll"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollingStats",
+            fields=[
+                (
+                    "summoner",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="summoner.summoner",
+                    ),
+                ),
+                ("recent_games", models.IntegerField(default=0)),
+                ("recent_wins", models.IntegerField(default=0)),
+                ("recent_kills", models.IntegerField(default=0)),
+                ("min_kills", models.IntegerField(default=0)),
+                ("max_kills", models.IntegerField(default=0)),
+                ("recent_deaths", models.IntegerField(default=0)),
+                ("min_deaths", models.IntegerField(default=0)),
+                ("max_deaths", models.IntegerField(default=0)),
+                ("recent_assists", models.IntegerField(default=0)),
+                ("min_assists", models.IntegerField(default=0)),
+                ("max_assists", models.IntegerField(default=0)),
+                ("recent_kda", models.FloatField(default=0)),
+                ("min_kda", models.FloatField(default=0)),
+                ("max_kda", models.FloatField(default=0)),
+                ("week_start", models.DateTimeField(null=True)),
+                ("week_games", models.IntegerField(default=0)),
+                ("epic_steals", models.IntegerField(default=0)),
+                ("kills", models.IntegerField(default=0)),
+                ("deaths", models.IntegerField(default=0)),
+                ("assists", models.IntegerField(default=0)),
+                ("kda", models.FloatField(default=0)),
+                ("win", models.IntegerField(default=0)),
+                ("vision_score", models.FloatField(default=0)),
+                ("first_blood_kill", models.IntegerField(default=0)),
+                ("first_blood_assist", models.IntegerField(default=0)),
+                ("first_tower_kill", models.IntegerField(default=0)),
+                ("first_tower_assist", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("games", models.IntegerField(default=0)),
+                ("epic_steals", models.IntegerField(default=0)),
+                ("kills", models.IntegerField(default=0)),
+                ("deaths", models.IntegerField(default=0)),
+                ("assists", models.IntegerField(default=0)),
+                ("kda", models.FloatField(default=0)),
+                ("win", models.IntegerField(default=0)),
+                ("vision_score", models.IntegerField(default=0)),
+                ("first_blood_kill", models.IntegerField(default=0)),
+                ("first_blood_assist", models.IntegerField(default=0)),
+                ("first_tower_kill", models.IntegerField(default=0)),
+                ("first_tower_assist", models.IntegerField(default=0)),
+                (
+                    "summoner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="summoner.summoner",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("summoner", "day")},
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.29 on 2026-10-18 13:12
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def copy_current_rank(apps, schema_editor):
+    Summoner = apps.get_model("summoner", "Summoner")
+    RankedRecord = apps.get_model("match", "RankedRecord")
+    for summoner in Summoner.objects.all():
+        record = (
+            RankedRecord.objects.filter(summoner=summoner)
+            .select_related("match", "promo")
+            .order_by(F("match__start_time").desc(nulls_last=True), "-pk")
+            .first()
+        )
+        if not record:
+            continue
+        promo = record.promo
+        # RankedRecord.absolute_value
+        absolute_lp = record.tier * 400 + record.lp
+        if record.tier <= 5:
+            absolute_lp += record.rank * 100
+        Summoner.objects.filter(pk=summoner.pk).update(
+            tier=record.tier,
+            rank=record.rank,
+            lp=record.lp,
+            promo_target=promo.target if promo else None,
+            promo_wins=promo.wins if promo else None,
+            promo_losses=promo.losses if promo else None,
+            promo_progress=promo.progress if promo else None,
+            absolute_lp=absolute_lp,
+            rank_time=record.match.start_time if record.match else timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("summoner", "0007_rollingstats_dailystats"),
+        ("match", "0013_match_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="summoner",
+            name="absolute_lp",
+            field=models.IntegerField(db_index=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="lp",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="promo_losses",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="promo_progress",
+            field=models.CharField(default=None, max_length=5, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="promo_target",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="promo_wins",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="rank",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="rank_time",
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="summoner",
+            name="tier",
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.RunPython(copy_current_rank, migrations.RunPython.noop),
+    ]
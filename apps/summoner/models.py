@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models import Avg, Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
 from riot_api import call_api
 from django.conf import settings
+from apps.summoner import cache as summoner_cache
 from apps.match.models import (
     Match,
+    Promos,
     RankedRecord,
     RiotAPIException,
     RiotEmptyResponseException,
@@ -15,9 +19,12 @@ from django.db.models.signals import post_save
 from apps.change.models import Change
 from model_utils import FieldTracker
 from discord_webhook import DiscordWebhook
+import threading
 import time
 from datetime import datetime, timedelta, timezone, time as t
 
+graph_lock = threading.Lock()
+
 
 class Summoner(models.Model):
     name = models.CharField(max_length=16, null=False)
@@ -26,7 +33,22 @@ class Summoner(models.Model):
     account_id = models.CharField(max_length=56)
     puu_id = models.CharField(max_length=78, unique=True)
     bully_opt_in = models.BooleanField(default=False)
-    tracker = FieldTracker()
+    next_poll = models.DateTimeField(null=True, default=None)
+    idle_polls = models.IntegerField(default=0)
+    # copy of the newest RankedRecord, see set_current_rank
+    tier = models.IntegerField(null=True, default=None)
+    rank = models.IntegerField(null=True, default=None)
+    lp = models.IntegerField(null=True, default=None)
+    promo_target = models.IntegerField(null=True, default=None)
+    promo_wins = models.IntegerField(null=True, default=None)
+    promo_losses = models.IntegerField(null=True, default=None)
+    promo_progress = models.CharField(max_length=5, null=True, default=None)
+    absolute_lp = models.IntegerField(null=True, default=None, db_index=True)
+    rank_time = models.DateTimeField(null=True, default=None)
+    # the rank snapshot is bookkeeping, only profile changes are logged
+    tracker = FieldTracker(
+        fields=["name", "report_hook", "summoner_id", "account_id", "puu_id"]
+    )
 
     def __str__(self):
         return f"{self.name}"
@@ -40,121 +62,117 @@ class Summoner(models.Model):
             "puu_id": self.puu_id,
         }
 
-    def get_weekly(self):
-        result = {
-            "epic_steals": 0,
-            "kills": 0,
-            "deaths": 0,
-            "assists": 0,
-            "kda": 0,
-            "win": 0,
-            "vision_score": 0,
-            "first_blood_kill": 0,
-            "first_blood_assist": 0,
-            "first_tower_kill": 0,
-            "first_tower_assist": 0,
+    @staticmethod
+    def week_range():
+        now = datetime.now(timezone.utc)
+        return [
+            (datetime.combine(now, t.min) - timedelta(weeks=1)).replace(
+                tzinfo=timezone.utc
+            ),
+            now,
+        ]
+
+    @staticmethod
+    def weekly_stats(prefix=""):
+        # prefix is "match__" when aggregating from the summoner side
+        def count_true(field):
+            # booleans can't be summed on every backend
+            return Count(f"{prefix}pk", filter=Q(**{f"{prefix}{field}": True}))
+
+        return {
+            "epic_steals": Sum(f"{prefix}epic_steals"),
+            "kills": Sum(f"{prefix}kills"),
+            "deaths": Sum(f"{prefix}deaths"),
+            "assists": Sum(f"{prefix}assists"),
+            "kda": Max(f"{prefix}kda"),
+            "win": count_true("win"),
+            "vision_score": Avg(f"{prefix}vision_score"),
+            "first_blood_kill": count_true("first_blood_kill"),
+            "first_blood_assist": count_true("first_blood_assist"),
+            "first_tower_kill": count_true("first_tower_kill"),
+            "first_tower_assist": count_true("first_tower_assist"),
         }
-        matches = self.match_set.filter(
-            start_time__range=[
-                (
-                    datetime.combine(datetime.now(timezone.utc), t.min)
-                    - timedelta(weeks=1)
-                ).replace(tzinfo=timezone.utc),
-                datetime.now(timezone.utc),
-            ]
-        )
-        for match in matches:
-            result["epic_steals"] += match.epic_steals
-            result["kills"] += match.kills
-            result["deaths"] += match.deaths
-            result["assists"] += match.assists
-            result["kda"] = match.kda if match.kda > result["kda"] else result["kda"]
-            result["win"] += match.win
-            result["vision_score"] += match.vision_score
-            result["first_blood_kill"] += match.first_blood_kill
-            result["first_blood_assist"] += match.first_blood_assist
-            result["first_tower_kill"] += match.first_tower_kill
-            result["first_tower_assist"] += match.first_tower_assist
-        if matches.exists():
-            result["vision_score"] = round(result["vision_score"] / len(matches), 2)
-            result["kda"] = round(result["kda"], 2)
-            return result
-        else:
+
+    def get_weekly(self):
+        stats = RollingStats.lookup(self)
+        if not stats.week_games:
             return None
+        return stats.week()
 
-    def recent_stats(self):
-        records = self.match_set.order_by("-start_time")[:10]
-        if not records:
+    @staticmethod
+    def weekly_leaderboard(stat):
+        # ranked from the materialized rows, see RollingStats
+        RollingStats.refresh_stale()
+        return list(
+            RollingStats.objects.filter(week_games__gt=0)
+            .exclude(**{stat: 0})
+            .order_by(f"-{stat}", "summoner_id")
+            .values_list("summoner__name", stat)
+        )
+
+    def recent_stats(self, stats=None):
+        stats = stats or RollingStats.lookup(self)
+        if not stats.recent_games:
             return f"No matches recorded yet for {self.name}"
-        length = len(records)
-        kills = deaths = assists = kda = wins = 0
-        min_kills = min_deaths = min_assists = min_kda = 10000
-        max_kills = max_deaths = max_assists = max_kda = 0
-        for match in records:
-            kills += match.kills
-            min_kills = match.kills if min_kills > match.kills else min_kills
-            max_kills = match.kills if max_kills < match.kills else max_kills
-            deaths += match.deaths
-            min_deaths = match.deaths if min_deaths > match.deaths else min_deaths
-            max_deaths = match.deaths if max_deaths < match.deaths else max_deaths
-            assists += match.assists
-            min_assists = match.assists if min_assists > match.assists else min_assists
-            max_assists = match.assists if max_assists < match.assists else max_assists
-            kda += match.kda
-            min_kda = match.kda if min_kda > match.kda else min_kda
-            max_kda = match.kda if max_kda < match.kda else max_kda
-            wins += 1 if match.win else 0
+        length = stats.recent_games
         return (
             f"Over the last {length} games, {self.name} has been averaging:\n"
-            f"{round(kills/length, 2)} kills ({min_kills} min, {max_kills} max)\n"
-            f"{round(deaths/length, 2)} deaths ({min_deaths} min, {max_deaths} max)\n"
-            f"{round(assists/length, 2)} assists ({min_assists} min, {max_assists} max)\n"
-            f"A {round(kda/length, 2)} KDA ({round(min_kda, 2)} min, {round(max_kda, 2)} max)\n\n"
-            f"{wins} wins, {length-wins} losses"
+            f"{round(stats.recent_kills/length, 2)} kills ({stats.min_kills} min, {stats.max_kills} max)\n"
+            f"{round(stats.recent_deaths/length, 2)} deaths ({stats.min_deaths} min, {stats.max_deaths} max)\n"
+            f"{round(stats.recent_assists/length, 2)} assists ({stats.min_assists} min, {stats.max_assists} max)\n"
+            f"A {round(stats.recent_kda/length, 2)} KDA ({round(stats.min_kda, 2)} min, {round(stats.max_kda, 2)} max)\n\n"
+            f"{stats.recent_wins} wins, {length-stats.recent_wins} losses"
         )
 
-    def graph(self, length=10, post=True):
-        if not self.match_set.last():
+    def recent_matches(self, length=10):
+        # newest first, records and promos joined in so reporting them is free
+        return list(
+            self.match_set.select_related("rankedrecord__promo").order_by(
+                "-start_time"
+            )[:length]
+        )
+
+    def graph(self, length=10, post=True, matches=None):
+        records = (matches or self.recent_matches(length))[:length]
+        if not records:
             return f"No ranked record available."
-        records = self.match_set.order_by("-start_time")[:length]
         base_val = records[0].rankedrecord.absolute_value() // 100 * 100
-        plt.plot(
-            range(1, len(records) + 1),
-            [
-                x.rankedrecord.absolute_value() - base_val
-                for x in list(reversed(records))
-            ],
-        )
-        file_name = f"graph_{records[0].summoner.name}.png"
-        plt.savefig(file_name)
+        file_name = f"graph_{self.name}.png"
+        # pyplot's current figure is global, the bot and the cron plot from
+        # several threads
+        with graph_lock:
+            plt.plot(
+                range(1, len(records) + 1),
+                [
+                    x.rankedrecord.absolute_value() - base_val
+                    for x in list(reversed(records))
+                ],
+            )
+            plt.savefig(file_name)
+            plt.clf()
         if self.report_hook and post:
             DiscordWebhook.post_image_to_discord(
                 self.report_hook,
                 f"LP graph over last {len(records)} games",
                 file_name,
             )
-        plt.clf()
         return f"LP graph over last {len(records)} games"
 
     def report_ongoing_promos(self, matches):
         # new promos
         if not matches[1].rankedrecord.promo:
-            DiscordWebhook.post_to_discord(
-                self.report_hook,
+            return [
                 f"Starting promos! {matches[0].rankedrecord.promo.target - matches[0].rankedrecord.promo.wins}"
-                " wins needed! May your inner-Faker channel through.",
-            )
-            return
+                " wins needed! May your inner-Faker channel through."
+            ]
 
         # won promo match
         if matches[0].win:
-            DiscordWebhook.post_to_discord(
-                self.report_hook,
+            return [
                 f"One step closer to {RankedRecord.int_to_tier(matches[0].rankedrecord.tier + 1)}! Keep it "
                 f"up! {5 - matches[0].rankedrecord.promo.losses - matches[0].rankedrecord.promo.wins}"
-                f" matches left to play.",
-            )
-            return
+                f" matches left to play."
+            ]
 
         # lost promo match
         if (
@@ -167,126 +185,179 @@ class Summoner(models.Model):
                 f"Clutch out those "
                 f"{matches[0].rankedrecord.promo.target - matches[0].rankedrecord.promo.wins} wins!"
             )
-        DiscordWebhook.post_to_discord(
-            self.report_hook,
+        return [
             f"Time to rally. Step up to the fight, bring them down! {clutch} "
             f"{5 - matches[0].rankedrecord.promo.losses - matches[0].rankedrecord.promo.wins} matches left "
-            f"to play.",
-        )
+            f"to play."
+        ]
 
     def report_promos_result(self, matches):
         if not matches[0].win:
-            DiscordWebhook.post_to_discord(
-                self.report_hook,
-                'Promos ended.. "Mission Failed. We\'ll Get Em Next Time."',
-            )
-        else:
-            DiscordWebhook.post_to_discord(
-                self.report_hook,
-                f"Promos ended, congratulations! Sally forth brave Summoner, may "
-                f"{RankedRecord.int_to_tier(matches[0].rankedrecord.tier)} be kind.",
-            )
+            return ['Promos ended.. "Mission Failed. We\'ll Get Em Next Time."']
+        return [
+            f"Promos ended, congratulations! Sally forth brave Summoner, may "
+            f"{RankedRecord.int_to_tier(matches[0].rankedrecord.tier)} be kind."
+        ]
 
     def report_regular_match(self, matches):
         trend = ""
         if len(matches) > 4:
             trend = RankedRecord.trend(matches[0].rankedrecord, matches[4].rankedrecord)
         match_result = "Gained" if matches[0].win else "Lost"
-        DiscordWebhook.post_to_discord(
-            self.report_hook,
+        lines = [
             f"{match_result} "
             f"{abs(matches[0].rankedrecord.absolute_value() - matches[1].rankedrecord.absolute_value())} LP."
-            f" {trend}",
-        )
+            f" {trend}"
+        ]
         # gained a rank/tier
         if (
             matches[0].rankedrecord.rank > matches[1].rankedrecord.rank
             and not matches[0].rankedrecord.tier < matches[1].rankedrecord.tier
         ) or matches[0].rankedrecord.tier > matches[1].rankedrecord.tier:
-            DiscordWebhook.post_to_discord(
-                self.report_hook,
+            lines.append(
                 f"Rising up to {RankedRecord.int_to_tier(matches[0].rankedrecord.tier)}"
-                f" {RankedRecord.int_to_rank(matches[0].rankedrecord.rank)}!",
+                f" {RankedRecord.int_to_rank(matches[0].rankedrecord.rank)}!"
             )
         # lost a rank/tier
         elif (
             matches[0].rankedrecord.rank < matches[1].rankedrecord.rank
             or matches[0].rankedrecord.tier < matches[1].rankedrecord.tier
         ):
-            DiscordWebhook.post_to_discord(
-                self.report_hook,
+            lines.append(
                 f"Dropped down to {RankedRecord.int_to_tier(matches[0].rankedrecord.tier)}"
                 f" {RankedRecord.int_to_rank(matches[0].rankedrecord.rank)}.. Time to rally. Step up to the "
-                f"fight, bring them down!",
+                f"fight, bring them down!"
             )
+        return lines
 
     def report_new_match_found(self):
         # no report link set
         if not self.report_hook:
             return
 
+        matches = self.recent_matches()
         # first detected match
-        if self.match_set.count() == 1:
-            record = self.match_set.first().rankedrecord
+        if len(matches) == 1:
+            record = matches[0].rankedrecord
             DiscordWebhook.post_to_discord(
                 self.report_hook, f"{self.name} added. Currently {record}."
             )
             return
 
         # report last match result
-        matches = self.match_set.order_by("-start_time")[:10]
         match_result = "won" if matches[0].win else "lost"
-        DiscordWebhook.post_to_discord(
-            self.report_hook,
-            f"{self.name} just {match_result} as {matches[0].champion_name}!",
-        )
+        lines = [f"{self.name} just {match_result} as {matches[0].champion_name}!"]
 
         # report active promos
         if matches[0].rankedrecord.promo:
-            self.report_ongoing_promos(matches)
+            lines += self.report_ongoing_promos(matches)
         # report promos that have ended
         elif matches[1].rankedrecord.promo:
-            self.report_promos_result(matches)
+            lines += self.report_promos_result(matches)
         # report regular match
         else:
-            self.report_regular_match(matches)
-        self.graph(10)
-        for event in matches[0].events():
-            DiscordWebhook.post_to_discord(self.report_hook, event)
+            lines += self.report_regular_match(matches)
+        lines += matches[0].events()
+        # the whole report packed into as few posts as fit, the graph goes
+        # with the last one so its caption sits right above it
+        lines.append(self.graph(10, post=False, matches=matches))
+        messages = DiscordWebhook.pack(lines)
+        for message in messages[:-1]:
+            DiscordWebhook.post_to_discord(self.report_hook, message)
+        DiscordWebhook.post_image_to_discord(
+            self.report_hook, messages[-1], f"graph_{self.name}.png"
+        )
 
     def poll(self):
         self.update_summoner_data()
-        matches_req = call_api(
-            f"https://europe.api.riotgames.com/lol/match/v5/matches/by-puuid/{self.puu_id}/ids?start=0&count=1&queue=420"
-        )
-
-        if matches_req.status_code != 200:
-            raise RiotAPIException(
-                f"Failed to poll match list: {matches_req.json()} {self.name}"
-            )
         last_match = self.match_set.last()
+        page = self.fetch_match_ids(last_match)
 
         try:
             # check if any ranked stats are available for the player
             rank = self.get_current_rank()
         except RiotEmptyResponseException:
             # no ranked stats available yet, in qualifiers
-            return
+            return False
 
-        for match_id in matches_req.json():
-            # check if we're caught up to the last stored match
-            if last_match and match_id == last_match.match_id:
-                return
+        # walk back until we're caught up to the last stored match
+        match_ids = []
+        while True:
+            for match_id in page:
+                if last_match and match_id == last_match.match_id:
+                    break
+                match_ids.append(match_id)
+                # ensure we only pull 1 match if a summoner just finished qualifiers
+                if not last_match:
+                    break
+            else:
+                # a full page of new matches, the stored one is further back
+                if last_match and len(page) == settings.POLL_MATCH_WINDOW:
+                    page = self.fetch_match_ids(last_match, len(match_ids))
+                    continue
+            break
+        if not match_ids:
+            return False
 
-            # new match found
-            match = Match.create_match(match_id, self)
-            RankedRecord.create_record(self, match, rank)
-            if self.report_hook:
-                self.report_new_match_found()
+        # only the newest match is covered by the current rank, older ones
+        # keep the last known rank so the newest report shows the full change
+        previous = None
+        if last_match:
+            previous = RankedRecord.objects.filter(match=last_match).first()
+        payloads = Match.fetch_payloads(match_ids)
+        for match_id, payload in reversed(list(zip(match_ids, payloads))):
+            match = Match.create_match(match_id, self, payload)
+            if match_id == match_ids[0] or not previous:
+                RankedRecord.create_record(self, match, rank)
+            else:
+                RankedRecord.create_record(self, match, previous.to_ranked())
+        summoner_cache.invalidate(self.name, match_ids[0])
+        if self.report_hook:
+            self.report_new_match_found()
+        return True
 
-            # ensure we only pull 1 match if a summoner just finished qualifiers
-            if not last_match:
-                return
+    def fetch_match_ids(self, last_match, start=0):
+        url = (
+            f"https://europe.api.riotgames.com/lol/match/v5/matches/by-puuid/{self.puu_id}/ids"
+            f"?start={start}&count={settings.POLL_MATCH_WINDOW}&queue=420"
+        )
+        # nothing older than the last stored match is needed
+        if last_match:
+            url += f"&startTime={int(last_match.start_time.timestamp())}"
+        matches_req = call_api(url)
+        if matches_req.status_code != 200:
+            raise RiotAPIException(
+                f"Failed to poll match list: {matches_req.json()} {self.name}"
+            )
+        return matches_req.json()
+
+    def schedule_next_poll(self, found_new):
+        now = datetime.now(timezone.utc)
+        self.idle_polls = 0 if found_new else self.idle_polls + 1
+        interval = settings.POLL_MIN_INTERVAL
+        last_match = self.match_set.order_by("-start_time").first()
+        if last_match:
+            # poll roughly in proportion to how long ago they last played
+            last_played = last_match.start_time + timedelta(seconds=last_match.duration)
+            interval = max(interval, (now - last_played).total_seconds() / 10)
+        # back off a little further for polls that didn't find anything new,
+        # capped low as the time since they last played already grows
+        interval = min(
+            interval * 2 ** min(self.idle_polls, 3), settings.POLL_MAX_INTERVAL
+        )
+        self.next_poll = now + timedelta(seconds=interval)
+        # update() rather than save() to not log a Change for scheduling
+        Summoner.objects.filter(pk=self.pk).update(
+            next_poll=self.next_poll, idle_polls=self.idle_polls
+        )
+        return self.next_poll
+
+    @staticmethod
+    def due_for_poll(now=None):
+        now = now or datetime.now(timezone.utc)
+        return Summoner.objects.filter(
+            Q(next_poll__isnull=True) | Q(next_poll__lte=now)
+        )
 
     def update_summoner_data(self):
         sum_req = call_api(
@@ -297,7 +368,10 @@ class Summoner(models.Model):
             self.name = reply.get("name")
             self.summoner_id = reply.get("id")
             self.account_id = reply.get("accountId")
-            self.save()
+            # nothing to write (or log) unless the profile actually changed
+            changed = self.tracker.changed()
+            if changed:
+                self.save(update_fields=list(changed))
         else:
             raise RiotAPIException(
                 f"Failed to update summoner info: {sum_req.json()} {self.puu_id}"
@@ -318,6 +392,46 @@ class Summoner(models.Model):
             f"Failed to find rank info: {rank_req} {self.summoner_id}"
         )
 
+    def set_current_rank(self, record):
+        # only moves forward, so records imported out of order don't replace
+        # a newer rank
+        promo = record.promo
+        snapshot = {
+            "tier": record.tier,
+            "rank": record.rank,
+            "lp": record.lp,
+            "promo_target": promo.target if promo else None,
+            "promo_wins": promo.wins if promo else None,
+            "promo_losses": promo.losses if promo else None,
+            "promo_progress": promo.progress if promo else None,
+            "absolute_lp": record.absolute_lp,
+            "rank_time": (
+                record.match.start_time if record.match else datetime.now(timezone.utc)
+            ),
+        }
+        # update() rather than save(), the snapshot doesn't need a Change row
+        if (
+            Summoner.objects.filter(pk=self.pk)
+            .filter(Q(rank_time__isnull=True) | Q(rank_time__lte=snapshot["rank_time"]))
+            .update(**snapshot)
+        ):
+            for field, value in snapshot.items():
+                setattr(self, field, value)
+
+    def current_rank(self):
+        # unsaved RankedRecord, for its formatting
+        if self.tier is None:
+            return None
+        promo = None
+        if self.promo_target is not None:
+            promo = Promos(
+                target=self.promo_target,
+                wins=self.promo_wins,
+                losses=self.promo_losses,
+                progress=self.promo_progress,
+            )
+        return RankedRecord(tier=self.tier, rank=self.rank, lp=self.lp, promo=promo)
+
     @staticmethod
     def create_summoner(name, report_hook=None):
         # get summoner info and create instance
@@ -350,7 +464,7 @@ class Summoner(models.Model):
 
     @staticmethod
     def on_update(sender, instance, **kwargs):
-        Change.objects.create(
+        Change.log(
             ref_object=instance,
             changes=instance.tracker.changed(),
             new_object=instance.to_json(),
@@ -358,3 +472,173 @@ class Summoner(models.Model):
 
 
 post_save.connect(Summoner.on_update, sender=Summoner)
+
+
+class DailyStats(models.Model):
+    # one bucket per summoner per (UTC) day, added to as matches come in
+    summoner = models.ForeignKey(Summoner, on_delete=models.CASCADE)
+    day = models.DateField()
+    games = models.IntegerField(default=0)
+    epic_steals = models.IntegerField(default=0)
+    kills = models.IntegerField(default=0)
+    deaths = models.IntegerField(default=0)
+    assists = models.IntegerField(default=0)
+    kda = models.FloatField(default=0)
+    win = models.IntegerField(default=0)
+    vision_score = models.IntegerField(default=0)
+    first_blood_kill = models.IntegerField(default=0)
+    first_blood_assist = models.IntegerField(default=0)
+    first_tower_kill = models.IntegerField(default=0)
+    first_tower_assist = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ["summoner", "day"]
+
+    @staticmethod
+    def add_match(match):
+        DailyStats.objects.get_or_create(
+            summoner_id=match.summoner_id, day=match.start_time.date()
+        )
+        DailyStats.objects.filter(
+            summoner_id=match.summoner_id, day=match.start_time.date()
+        ).update(
+            games=F("games") + 1,
+            kda=Greatest(
+                "kda", Value(float(match.kda), output_field=models.FloatField())
+            ),
+            **{
+                stat: F(stat) + int(getattr(match, stat))
+                for stat in Summoner.weekly_stats()
+                if stat != "kda"
+            },
+        )
+
+    @staticmethod
+    def rebuild(summoner):
+        DailyStats.objects.filter(summoner=summoner).delete()
+        buckets = (
+            summoner.match_set.annotate(day=TruncDate("start_time"))
+            .order_by()
+            .values("day")
+            .annotate(
+                games=Count("pk"),
+                **{**Summoner.weekly_stats(), "vision_score": Sum("vision_score")},
+            )
+        )
+        DailyStats.objects.bulk_create(
+            [DailyStats(summoner=summoner, **bucket) for bucket in buckets]
+        )
+
+
+class RollingStats(models.Model):
+    # what $recent and $weekly read, kept current by on_match_created
+    summoner = models.OneToOneField(
+        Summoner, on_delete=models.CASCADE, primary_key=True
+    )
+    # the last 10 games
+    recent_games = models.IntegerField(default=0)
+    recent_wins = models.IntegerField(default=0)
+    recent_kills = models.IntegerField(default=0)
+    min_kills = models.IntegerField(default=0)
+    max_kills = models.IntegerField(default=0)
+    recent_deaths = models.IntegerField(default=0)
+    min_deaths = models.IntegerField(default=0)
+    max_deaths = models.IntegerField(default=0)
+    recent_assists = models.IntegerField(default=0)
+    min_assists = models.IntegerField(default=0)
+    max_assists = models.IntegerField(default=0)
+    recent_kda = models.FloatField(default=0)
+    min_kda = models.FloatField(default=0)
+    max_kda = models.FloatField(default=0)
+    # Summoner.week_range starting at week_start, summed from the daily buckets
+    week_start = models.DateTimeField(null=True)
+    week_games = models.IntegerField(default=0)
+    epic_steals = models.IntegerField(default=0)
+    kills = models.IntegerField(default=0)
+    deaths = models.IntegerField(default=0)
+    assists = models.IntegerField(default=0)
+    kda = models.FloatField(default=0)
+    win = models.IntegerField(default=0)
+    vision_score = models.FloatField(default=0)
+    first_blood_kill = models.IntegerField(default=0)
+    first_blood_assist = models.IntegerField(default=0)
+    first_tower_kill = models.IntegerField(default=0)
+    first_tower_assist = models.IntegerField(default=0)
+
+    def week(self):
+        return {stat: getattr(self, stat) for stat in Summoner.weekly_stats()}
+
+    def refresh_recent(self):
+        records = list(self.summoner.match_set.order_by("-start_time")[:10])
+        self.recent_games = len(records)
+        self.recent_wins = sum(1 for match in records if match.win)
+        for stat in ("kills", "deaths", "assists", "kda"):
+            values = [getattr(match, stat) for match in records] or [0]
+            setattr(self, f"recent_{stat}", sum(values))
+            setattr(self, f"min_{stat}", min(values))
+            setattr(self, f"max_{stat}", max(values))
+
+    def refresh_week(self):
+        self.week_start = Summoner.week_range()[0]
+        week = self.summoner.dailystats_set.filter(
+            day__gte=self.week_start.date()
+        ).aggregate(
+            week_games=Sum("games"),
+            kda=Max("kda"),
+            **{stat: Sum(stat) for stat in Summoner.weekly_stats() if stat != "kda"},
+        )
+        for stat, value in week.items():
+            setattr(self, stat, value or 0)
+        if self.week_games:
+            self.vision_score = round(self.vision_score / self.week_games, 2)
+        self.kda = round(max(self.kda, 0), 2)
+
+    @staticmethod
+    def rebuild(summoner):
+        DailyStats.rebuild(summoner)
+        stats = RollingStats(summoner=summoner)
+        stats.refresh_recent()
+        stats.refresh_week()
+        stats.save()
+        return stats
+
+    @staticmethod
+    def lookup(summoner):
+        stats = RollingStats.objects.filter(summoner=summoner).first()
+        if not stats:
+            # first look at a summoner tracked from before these tables
+            return RollingStats.rebuild(summoner)
+        if stats.week_start != Summoner.week_range()[0]:
+            # a day has rolled out of the window since the last match
+            stats.refresh_week()
+            stats.save()
+        return stats
+
+    @staticmethod
+    def refresh_stale():
+        # one query finds the stale rows and the summoners without a row yet,
+        # e.g. everyone tracked before these tables, then a refresh per row
+        for summoner in Summoner.objects.exclude(
+            rollingstats__week_start=Summoner.week_range()[0]
+        ).select_related("rollingstats"):
+            if not hasattr(summoner, "rollingstats"):
+                RollingStats.rebuild(summoner)
+                continue
+            summoner.rollingstats.refresh_week()
+            summoner.rollingstats.save()
+
+    @staticmethod
+    def on_match_created(sender, instance, created, **kwargs):
+        if not created:
+            return
+        stats = RollingStats.objects.filter(summoner_id=instance.summoner_id).first()
+        if not stats:
+            RollingStats.rebuild(instance.summoner)
+            return
+        DailyStats.add_match(instance)
+        stats.refresh_recent()
+        stats.refresh_week()
+        stats.save()
+
+
+post_save.connect(RollingStats.on_match_created, sender=Match)
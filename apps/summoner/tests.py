@@ -1,9 +1,12 @@
-from django.test import TestCase
-from unittest.mock import patch, MagicMock
-from apps.summoner.models import Summoner
+from django.test import TestCase, TransactionTestCase
+from unittest.mock import patch, AsyncMock, MagicMock
+from apps.summoner.models import Summoner, DailyStats, RollingStats
+from apps.summoner import cache as summoner_cache
 from apps.match.models import Match, RankedRecord, Promos, RiotAPIException, RiotEmptyResponseException
 from apps.change.models import Change
 from datetime import datetime, timezone, timedelta
+from discord_webhook import DiscordWebhook, MESSAGE_LIMIT
+from scripts import rebuild_stats
 
 
 class TestSummonerStr(TestCase):
@@ -93,6 +96,82 @@ class TestSummonerGetWeekly(TestCase):
         self.assertEqual(result["first_tower_kill"], 1)
         self.assertEqual(result["first_tower_assist"], 1)
 
+    def test_single_query_ignores_older_matches(self):
+        now = datetime.now(timezone.utc)
+        for i, days in enumerate([1, 30]):
+            Match.objects.create(
+                match_id=f"EUW1_Q{i}",
+                summoner=self.summoner,
+                champion_name="Ahri",
+                kills=4,
+                kda=2.5,
+                vision_score=15,
+                start_time=now - timedelta(days=days),
+            )
+        with self.assertNumQueries(1):
+            result = self.summoner.get_weekly()
+        self.assertEqual(result["kills"], 4)
+        self.assertEqual(result["kda"], 2.5)
+        self.assertEqual(result["vision_score"], 15.0)
+        self.assertEqual(result["win"], 0)
+
+
+class TestSummonerWeeklyLeaderboard(TestCase):
+    def setUp(self):
+        now = datetime.now(timezone.utc)
+        for i, kills in enumerate([3, 9, 0]):
+            summoner = Summoner.objects.create(
+                name=f"Player{i}",
+                summoner_id=f"sum{i}",
+                account_id=f"acc{i}",
+                puu_id=f"puu_leaderboard_{i}",
+            )
+            for j in range(2):
+                Match.objects.create(
+                    match_id=f"EUW1_L{i}{j}",
+                    summoner=summoner,
+                    champion_name="Ahri",
+                    kills=kills,
+                    kda=1.0 + i + j / 3,
+                    vision_score=10 + j,
+                    win=j == 0,
+                    start_time=now - timedelta(days=1 + j),
+                )
+            Match.objects.create(
+                match_id=f"EUW1_L{i}_old",
+                summoner=summoner,
+                champion_name="Ahri",
+                kills=100,
+                start_time=now - timedelta(days=30),
+            )
+
+    def test_stale_check_and_one_ranking_query(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                Summoner.weekly_leaderboard("kills"), [("Player1", 18), ("Player0", 6)]
+            )
+
+    def test_summoners_without_a_row_are_built(self):
+        # as after migrating, when nobody has a row yet
+        RollingStats.objects.all().delete()
+        DailyStats.objects.all().delete()
+        self.assertEqual(
+            Summoner.weekly_leaderboard("kills"), [("Player1", 18), ("Player0", 6)]
+        )
+        self.assertEqual(RollingStats.objects.count(), Summoner.objects.count())
+        with self.assertNumQueries(2):
+            Summoner.weekly_leaderboard("kills")
+
+    def test_matches_get_weekly(self):
+        for stat in Summoner.weekly_stats():
+            expected = [
+                (summ.name, summ.get_weekly()[stat])
+                for summ in Summoner.objects.all()
+                if summ.get_weekly()[stat] != 0
+            ]
+            expected.sort(key=lambda tup: tup[1], reverse=True)
+            self.assertEqual(Summoner.weekly_leaderboard(stat), expected, stat)
+
 
 class TestSummonerRecentStats(TestCase):
     def setUp(self):
@@ -130,6 +209,152 @@ class TestSummonerRecentStats(TestCase):
         self.assertIn("2 wins", result)
 
 
+class TestRollingStats(TestCase):
+    def setUp(self):
+        self.summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_rolling",
+        )
+        now = datetime.now(timezone.utc)
+        for i in range(12):
+            Match.objects.create(
+                match_id=f"EUW1_S{i}",
+                summoner=self.summoner,
+                champion_name="Ahri",
+                kills=i,
+                deaths=1,
+                assists=2,
+                kda=i + 2.0,
+                vision_score=10 + i,
+                win=i % 3 == 0,
+                first_blood_kill=i == 4,
+                start_time=now - timedelta(days=i),
+            )
+
+    def snapshot(self):
+        stats = RollingStats.objects.get(summoner=self.summoner)
+        return {
+            field.name: getattr(stats, field.name)
+            for field in RollingStats._meta.fields
+        }
+
+    def test_incremental_matches_rebuild(self):
+        incremental = self.snapshot()
+        days = list(DailyStats.objects.order_by("day").values_list("day", "games", "kills", "win"))
+        RollingStats.rebuild(self.summoner)
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(
+            list(DailyStats.objects.order_by("day").values_list("day", "games", "kills", "win")),
+            days,
+        )
+
+    def test_recent_is_last_ten(self):
+        stats = RollingStats.objects.get(summoner=self.summoner)
+        self.assertEqual(stats.recent_games, 10)
+        self.assertEqual(stats.recent_kills, sum(range(10)))
+        self.assertEqual((stats.min_kills, stats.max_kills), (0, 9))
+        self.assertEqual(stats.recent_wins, 4)
+
+    def test_week_from_daily_buckets(self):
+        week = self.summoner.get_weekly()
+        self.assertEqual(week["kills"], sum(range(8)))
+        self.assertEqual(week["kda"], 9.0)
+        self.assertEqual(week["vision_score"], 13.5)
+        self.assertEqual(week["win"], 3)
+        self.assertEqual(week["first_blood_kill"], 1)
+
+    def test_single_row_lookups(self):
+        with self.assertNumQueries(1):
+            self.summoner.recent_stats()
+        with self.assertNumQueries(1):
+            self.summoner.get_weekly()
+
+    def test_stale_week_is_refreshed(self):
+        RollingStats.objects.update(
+            week_start=Summoner.week_range()[0] - timedelta(days=1), kills=1000
+        )
+        self.assertEqual(self.summoner.get_weekly()["kills"], sum(range(8)))
+        self.assertEqual(
+            RollingStats.objects.get(summoner=self.summoner).week_start,
+            Summoner.week_range()[0],
+        )
+
+    def test_missing_row_is_rebuilt(self):
+        RollingStats.objects.all().delete()
+        DailyStats.objects.all().delete()
+        self.assertIn("Over the last 10 games", self.summoner.recent_stats())
+        self.assertEqual(DailyStats.objects.count(), 12)
+
+    @patch("scripts.rebuild_stats.print")
+    def test_rebuild_stats_script(self, mock_print):
+        incremental = self.snapshot()
+        leaderboard = Summoner.weekly_leaderboard("kills")
+        recent = self.summoner.recent_stats()
+        RollingStats.objects.all().delete()
+        DailyStats.objects.all().delete()
+        self.assertEqual(rebuild_stats.run(), 1)
+        self.assertEqual(DailyStats.objects.count(), 12)
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(Summoner.weekly_leaderboard("kills"), leaderboard)
+        self.assertEqual(self.summoner.recent_stats(), recent)
+
+
+class TestSummonerCurrentRank(TestCase):
+    def setUp(self):
+        self.summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_current_rank",
+        )
+
+    def _record(self, summoner, match_id, days_ago, ranked):
+        match = Match.objects.create(
+            match_id=match_id,
+            summoner=summoner,
+            champion_name="Ahri",
+            start_time=datetime.now(timezone.utc) - timedelta(days=days_ago),
+        )
+        return RankedRecord.create_record(summoner, match, ranked)
+
+    def test_snapshot_follows_newest_record(self):
+        self._record(self.summoner, "EUW1_C1", 2, {"tier": "GOLD", "rank": "II", "leaguePoints": 50})
+        record = self._record(
+            self.summoner,
+            "EUW1_C2",
+            1,
+            {
+                "tier": "GOLD",
+                "rank": "I",
+                "leaguePoints": 100,
+                "miniSeries": {"target": 3, "wins": 1, "losses": 0, "progress": "WNN"},
+            },
+        )
+        summoner = Summoner.objects.get(pk=self.summoner.pk)
+        self.assertEqual(summoner.absolute_lp, record.absolute_value())
+        self.assertEqual(str(summoner.current_rank()), str(record))
+        self.assertEqual(summoner.promo_progress, "WNN")
+        self.assertEqual(self.summoner.lp, 100)
+
+    def test_older_record_keeps_snapshot(self):
+        self._record(self.summoner, "EUW1_C1", 1, {"tier": "GOLD", "rank": "II", "leaguePoints": 50})
+        self._record(self.summoner, "EUW1_C2", 5, {"tier": "SILVER", "rank": "I", "leaguePoints": 10})
+        summoner = Summoner.objects.get(pk=self.summoner.pk)
+        self.assertEqual((summoner.tier, summoner.rank, summoner.lp), (3, 2, 50))
+
+    def test_snapshot_is_not_logged(self):
+        changes = Change.objects.count()
+        self._record(self.summoner, "EUW1_C1", 1, {"tier": "GOLD", "rank": "II", "leaguePoints": 50})
+        self.assertEqual(Change.objects.count(), changes)
+        self.summoner.save()
+        self.assertEqual(Change.objects.last().changes, {})
+
+    def test_no_rank(self):
+        self.assertIsNone(self.summoner.current_rank())
+
+
 class TestSummonerGraph(TestCase):
     def setUp(self):
         self.summoner = Summoner.objects.create(
@@ -257,9 +482,9 @@ class TestSummonerReportMethods(TestCase):
         )
 
         matches = self.summoner.match_set.order_by("-start_time")[:10]
-        self.summoner.report_ongoing_promos(matches)
-        mock_webhook.post_to_discord.assert_called_once()
-        self.assertIn("Starting promos", mock_webhook.post_to_discord.call_args[0][1])
+        lines = self.summoner.report_ongoing_promos(matches)
+        self.assertEqual(len(lines), 1)
+        self.assertIn("Starting promos", lines[0])
 
     @patch("apps.summoner.models.DiscordWebhook")
     def test_report_regular_match(self, mock_webhook):
@@ -277,10 +502,89 @@ class TestSummonerReportMethods(TestCase):
             )
 
         matches = self.summoner.match_set.order_by("-start_time")[:10]
-        self.summoner.report_regular_match(matches)
-        mock_webhook.post_to_discord.assert_called()
-        first_call = mock_webhook.post_to_discord.call_args_list[0]
-        self.assertIn("Gained", first_call[0][1])
+        lines = self.summoner.report_regular_match(matches)
+        self.assertIn("Gained", lines[0])
+
+
+class TestSummonerReportQueryBudget(TestCase):
+    def setUp(self):
+        self.summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_report_budget",
+            report_hook="https://hook",
+        )
+        now = datetime.now(timezone.utc)
+        for i in range(12):
+            m = Match.objects.create(
+                match_id=f"EUW1_B{i}",
+                summoner=self.summoner, champion_name="Ahri",
+                start_time=now - timedelta(hours=i),
+                win=i % 2 == 0,
+            )
+            RankedRecord.objects.create(
+                tier=3, rank=2, lp=80 - i * 5,
+                summoner=self.summoner, match=m,
+            )
+
+    def _add_promos(self, *match_ids):
+        for match_id in match_ids:
+            record = RankedRecord.objects.get(match__match_id=match_id)
+            record.promo = Promos.objects.create(target=3, wins=1, losses=1, progress="WLN")
+            record.save()
+
+    @patch("apps.summoner.models.DiscordWebhook")
+    @patch("apps.summoner.models.plt")
+    def test_regular_match_in_one_query(self, mock_plt, mock_webhook):
+        mock_webhook.pack.side_effect = DiscordWebhook.pack
+        with self.assertNumQueries(1):
+            self.summoner.report_new_match_found()
+        self.assertIn("Gained", mock_webhook.post_image_to_discord.call_args[0][1])
+        mock_webhook.post_image_to_discord.assert_called_once()
+
+    @patch("apps.summoner.models.DiscordWebhook")
+    @patch("apps.summoner.models.plt")
+    def test_ongoing_promos_in_one_query(self, mock_plt, mock_webhook):
+        mock_webhook.pack.side_effect = DiscordWebhook.pack
+        self._add_promos("EUW1_B0", "EUW1_B1")
+        with self.assertNumQueries(1):
+            self.summoner.report_new_match_found()
+        self.assertIn("One step closer", mock_webhook.post_image_to_discord.call_args[0][1])
+
+    @patch("apps.summoner.models.DiscordWebhook")
+    @patch("apps.summoner.models.plt")
+    def test_promos_result_in_one_query(self, mock_plt, mock_webhook):
+        mock_webhook.pack.side_effect = DiscordWebhook.pack
+        self._add_promos("EUW1_B1")
+        with self.assertNumQueries(1):
+            self.summoner.report_new_match_found()
+        self.assertIn("Promos ended", mock_webhook.post_image_to_discord.call_args[0][1])
+
+    @patch("apps.summoner.models.DiscordWebhook")
+    @patch("apps.summoner.models.plt")
+    def test_report_packed_into_one_post(self, mock_plt, mock_webhook):
+        mock_webhook.pack.side_effect = DiscordWebhook.pack
+        Match.objects.filter(match_id="EUW1_B0").update(
+            triple_kills=1, first_blood_kill=True, duration=3100
+        )
+        self.summoner.report_new_match_found()
+        mock_webhook.post_to_discord.assert_not_called()
+        mock_webhook.post_image_to_discord.assert_called_once()
+        hook, message, file_name = mock_webhook.post_image_to_discord.call_args[0]
+        self.assertEqual(file_name, "graph_TestPlayer.png")
+        lines = message.split("\n")
+        self.assertEqual(lines[0], "TestPlayer just won as Ahri!")
+        self.assertIn("Trip-Trip-Triple", message)
+        self.assertIn("claimed first blood", message)
+        self.assertEqual(lines[-1], "LP graph over last 10 games")
+
+    @patch("apps.summoner.models.DiscordWebhook")
+    @patch("apps.summoner.models.plt")
+    def test_graph_in_one_query(self, mock_plt, mock_webhook):
+        with self.assertNumQueries(1):
+            self.summoner.graph(10)
+        self.assertEqual(len(mock_plt.plot.call_args[0][1]), 10)
 
 
 class TestSummonerPoll(TestCase):
@@ -318,8 +622,9 @@ class TestSummonerPoll(TestCase):
 
         mock_call_api.side_effect = [update_resp, matches_resp, rank_resp]
 
-        self.summoner.poll()
+        found = self.summoner.poll()
         # No new match created
+        self.assertFalse(found)
         self.assertEqual(Match.objects.filter(summoner=self.summoner).count(), 1)
 
     @patch("apps.summoner.models.call_api")
@@ -339,6 +644,232 @@ class TestSummonerPoll(TestCase):
         with self.assertRaises(RiotAPIException):
             self.summoner.poll()
 
+    @patch("apps.match.models.fetch_matches")
+    @patch("apps.summoner.models.call_api")
+    def test_poll_catches_up_in_order(self, mock_call_api, mock_fetch):
+        old = Match.objects.create(
+            match_id="EUW1_OLD",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+        RankedRecord.objects.create(
+            tier=3, rank=2, lp=50, summoner=self.summoner, match=old,
+        )
+
+        update_resp = MagicMock()
+        update_resp.status_code = 200
+        update_resp.json.return_value = {
+            "name": "TestPlayer", "id": "sum123", "accountId": "acc123",
+        }
+
+        matches_resp = MagicMock()
+        matches_resp.status_code = 200
+        matches_resp.json.return_value = ["EUW1_NEW2", "EUW1_NEW1", "EUW1_OLD", "EUW1_OLDER"]
+
+        rank_resp = MagicMock()
+        rank_resp.status_code = 200
+        rank_resp.json.return_value = [{"queueType": "RANKED_SOLO_5x5", "tier": "GOLD", "rank": "II", "leaguePoints": 90}]
+
+        mock_call_api.side_effect = [update_resp, matches_resp, rank_resp]
+
+        def match_resp(start):
+            resp = MagicMock()
+            resp.status_code = 200
+            resp.json.return_value = {
+                "info": {
+                    "queueId": 420,
+                    "gameStartTimestamp": start,
+                    "gameDuration": 1800,
+                    "participants": [
+                        {
+                            "puuid": "puu_poll", "championName": "Zed",
+                            "pentaKills": 0, "quadraKills": 0, "tripleKills": 0,
+                            "kills": 5, "deaths": 3, "assists": 7, "win": True,
+                            "visionWardsBoughtInGame": 2, "wardsPlaced": 10,
+                            "visionScore": 30, "longestTimeSpentLiving": 600,
+                            "firstBloodKill": False, "firstBloodAssist": False,
+                            "firstTowerKill": False, "firstTowerAssist": False,
+                            "challenges": {"epicMonsterSteals": 0, "kda": 4.0},
+                        }
+                    ],
+                }
+            }
+            return resp
+
+        mock_fetch.return_value = [match_resp(1704160800000), match_resp(1704153600000)]
+
+        with patch.object(Match, "write"):
+            found = self.summoner.poll()
+
+        self.assertTrue(found)
+        mock_fetch.assert_called_once_with(["EUW1_NEW2", "EUW1_NEW1"])
+        ids = list(Match.objects.filter(summoner=self.summoner).values_list("match_id", flat=True))
+        self.assertEqual(ids, ["EUW1_OLD", "EUW1_NEW1", "EUW1_NEW2"])
+        self.assertEqual(Match.objects.get(match_id="EUW1_NEW1").rankedrecord.lp, 50)
+        self.assertEqual(Match.objects.get(match_id="EUW1_NEW2").rankedrecord.lp, 90)
+        self.assertEqual(summoner_cache.latest_match_id("TestPlayer"), "EUW1_NEW2")
+
+    @patch("apps.match.models.fetch_matches")
+    @patch("apps.summoner.models.call_api")
+    def test_poll_catch_up_keeps_promos(self, mock_call_api, mock_fetch):
+        old = Match.objects.create(
+            match_id="EUW1_OLD",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+        promo = Promos.objects.create(target=3, wins=1, losses=0, progress="WNN")
+        RankedRecord.objects.create(
+            tier=3, rank=2, lp=100, summoner=self.summoner, match=old, promo=promo,
+        )
+
+        update_resp = MagicMock()
+        update_resp.status_code = 200
+        update_resp.json.return_value = {
+            "name": "TestPlayer", "id": "sum123", "accountId": "acc123",
+        }
+
+        matches_resp = MagicMock()
+        matches_resp.status_code = 200
+        matches_resp.json.return_value = ["EUW1_NEW2", "EUW1_NEW1", "EUW1_OLD", "EUW1_OLDER"]
+
+        rank_resp = MagicMock()
+        rank_resp.status_code = 200
+        rank_resp.json.return_value = [{"queueType": "RANKED_SOLO_5x5", "tier": "GOLD", "rank": "II", "leaguePoints": 90}]
+
+        mock_call_api.side_effect = [update_resp, matches_resp, rank_resp]
+
+        def match_resp(start):
+            resp = MagicMock()
+            resp.status_code = 200
+            resp.json.return_value = {
+                "info": {
+                    "queueId": 420,
+                    "gameStartTimestamp": start,
+                    "gameDuration": 1800,
+                    "participants": [
+                        {
+                            "puuid": "puu_poll", "championName": "Zed",
+                            "pentaKills": 0, "quadraKills": 0, "tripleKills": 0,
+                            "kills": 5, "deaths": 3, "assists": 7, "win": True,
+                            "visionWardsBoughtInGame": 2, "wardsPlaced": 10,
+                            "visionScore": 30, "longestTimeSpentLiving": 600,
+                            "firstBloodKill": False, "firstBloodAssist": False,
+                            "firstTowerKill": False, "firstTowerAssist": False,
+                            "challenges": {"epicMonsterSteals": 0, "kda": 4.0},
+                        }
+                    ],
+                }
+            }
+            return resp
+
+        mock_fetch.return_value = [match_resp(1704160800000), match_resp(1704153600000)]
+
+        with patch.object(Match, "write"):
+            found = self.summoner.poll()
+
+        self.assertTrue(found)
+        caught_up = Match.objects.get(match_id="EUW1_NEW1").rankedrecord
+        self.assertEqual(caught_up.lp, 100)
+        self.assertEqual(caught_up.promo, promo)
+        self.assertNotEqual(caught_up.promo.pk, promo.pk)
+
+    @patch("apps.match.models.fetch_matches")
+    @patch("apps.summoner.models.call_api")
+    def test_poll_pages_back_to_last_stored_match(self, mock_call_api, mock_fetch):
+        old = Match.objects.create(
+            match_id="EUW1_OLD",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+        RankedRecord.objects.create(
+            tier=3, rank=2, lp=50, summoner=self.summoner, match=old,
+        )
+
+        def reply(data):
+            resp = MagicMock()
+            resp.status_code = 200
+            resp.json.return_value = data
+            return resp
+
+        mock_call_api.side_effect = [
+            reply({"name": "TestPlayer", "id": "sum123", "accountId": "acc123"}),
+            reply(["EUW1_N3", "EUW1_N2"]),
+            reply([{"queueType": "RANKED_SOLO_5x5", "tier": "GOLD", "rank": "II", "leaguePoints": 90}]),
+            reply(["EUW1_N1", "EUW1_OLD"]),
+        ]
+        mock_fetch.side_effect = RiotAPIException("stop after listing")
+
+        with self.settings(POLL_MATCH_WINDOW=2), self.assertRaises(RiotAPIException):
+            self.summoner.poll()
+
+        mock_fetch.assert_called_once_with(["EUW1_N3", "EUW1_N2", "EUW1_N1"])
+        second_page = mock_call_api.call_args_list[3][0][0]
+        self.assertIn("start=2&count=2", second_page)
+        self.assertIn(f"startTime={int(old.start_time.timestamp())}", second_page)
+
+
+class TestSummonerSchedule(TestCase):
+    def setUp(self):
+        self.summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_schedule",
+        )
+
+    def _play(self, ago):
+        Match.objects.create(
+            match_id="EUW1_SCHED",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime.now(timezone.utc) - ago,
+            duration=1800,
+        )
+
+    def test_active_player_polled_often(self):
+        self._play(timedelta(hours=1))
+        next_poll = self.summoner.schedule_next_poll(True)
+        delta = next_poll - datetime.now(timezone.utc)
+        self.assertLessEqual(delta, timedelta(minutes=6))
+        self.assertEqual(self.summoner.idle_polls, 0)
+
+    def test_dormant_player_polled_rarely(self):
+        self._play(timedelta(days=180))
+        next_poll = self.summoner.schedule_next_poll(False)
+        delta = next_poll - datetime.now(timezone.utc)
+        self.assertGreater(delta, timedelta(hours=23))
+        self.assertLessEqual(delta, timedelta(days=1))
+
+    def test_backs_off_when_nothing_new(self):
+        self._play(timedelta(hours=1))
+        first = self.summoner.schedule_next_poll(False) - datetime.now(timezone.utc)
+        second = self.summoner.schedule_next_poll(False) - datetime.now(timezone.utc)
+        self.assertGreater(second, first * 1.9)
+        self.summoner.refresh_from_db()
+        self.assertEqual(self.summoner.idle_polls, 2)
+
+    def test_short_break_polled_within_hours(self):
+        # last played two hours ago, polled without result since
+        self._play(timedelta(hours=2, minutes=30))
+        self.summoner.idle_polls = 20
+        next_poll = self.summoner.schedule_next_poll(False)
+        delta = next_poll - datetime.now(timezone.utc)
+        self.assertLessEqual(delta, timedelta(hours=2))
+
+    def test_schedule_does_not_log_change(self):
+        initial_count = Change.objects.count()
+        self.summoner.schedule_next_poll(False)
+        self.assertEqual(Change.objects.count(), initial_count)
+
+    def test_due_for_poll(self):
+        now = datetime.now(timezone.utc)
+        self.assertIn(self.summoner, Summoner.due_for_poll(now))
+        self.summoner.schedule_next_poll(False)
+        self.assertNotIn(self.summoner, Summoner.due_for_poll(now))
+
 
 class TestSummonerCreateSummoner(TestCase):
     @patch("apps.summoner.models.Match.find_last_ranked")
@@ -411,3 +942,270 @@ class TestSummonerOnUpdate(TestCase):
         self.assertEqual(Change.objects.count(), initial_count + 1)
         latest_change = Change.objects.last()
         self.assertIn("name", latest_change.new_object)
+
+
+class TestSummonerUpdateSummonerData(TestCase):
+    def setUp(self):
+        self.summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_update_data",
+        )
+
+    def _reply(self, name):
+        mock_resp = MagicMock()
+        mock_resp.status_code = 200
+        mock_resp.json.return_value = {"name": name, "id": "sum123", "accountId": "acc123"}
+        return mock_resp
+
+    @patch("apps.summoner.models.call_api")
+    def test_unchanged_profile_is_not_written(self, mock_call_api):
+        mock_call_api.return_value = self._reply("TestPlayer")
+        initial_count = Change.objects.count()
+        with self.assertNumQueries(0):
+            self.summoner.update_summoner_data()
+        self.assertEqual(Change.objects.count(), initial_count)
+
+    @patch("apps.summoner.models.call_api")
+    def test_rename_is_written_and_logged(self, mock_call_api):
+        mock_call_api.return_value = self._reply("NewName")
+        initial_count = Change.objects.count()
+        self.summoner.update_summoner_data()
+        self.assertEqual(Summoner.objects.get(pk=self.summoner.pk).name, "NewName")
+        self.assertEqual(Change.objects.count(), initial_count + 1)
+        self.assertEqual(Change.objects.last().changes, {"name": "TestPlayer"})
+
+
+
+class TestBotReadCommands(TransactionTestCase):
+    # commands run on the bot's own threads, so the rows have to be committed
+    def setUp(self):
+        import discord
+        import logging
+        from bot import YetAnotherBot
+
+        handler = logging.NullHandler()
+        with patch("bot.logging.FileHandler", return_value=handler):
+            self.bot = YetAnotherBot(prefix="$", bot=False, intentions=discord.Intents.default())
+        self.addCleanup(logging.getLogger("discord").removeHandler, handler)
+        self.addCleanup(self.bot.db.shutdown)
+        summoner_cache.get_cache().clear()
+        self.summoner = Summoner.objects.create(
+            name="TestPlayer",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_bot_read",
+        )
+        now = datetime.now(timezone.utc)
+        for i in range(3):
+            m = Match.objects.create(
+                match_id=f"EUW1_BOT{i}",
+                summoner=self.summoner, champion_name="Ahri",
+                kills=i, deaths=1, assists=2, kda=i + 2.0, vision_score=20,
+                start_time=now - timedelta(hours=i),
+                win=i == 0,
+            )
+            RankedRecord.create_record(
+                self.summoner, m, {"tier": "GOLD", "rank": "II", "leaguePoints": 50 - i}
+            )
+
+    async def command(self, name, *args):
+        ctx = MagicMock()
+        ctx.channel.send = AsyncMock()
+        await self.bot.get_command(name).callback(ctx, *args)
+        return [call.args[0] for call in ctx.channel.send.call_args_list]
+
+    async def test_reads_run_on_the_pool(self):
+        # with the connection handling of DatabaseExecutor.call around them
+        with patch("bot_executor.close_old_connections") as mock_close:
+            for command in ["rank", "recent", "last_match"]:
+                await self.command(command, "TestPlayer")
+            await self.command("match_info", "EUW1_BOT0")
+        self.assertEqual(mock_close.call_count, 8)
+
+    async def test_rank(self):
+        self.assertEqual(await self.command("rank", "TestPlayer"), ["TestPlayer is GOLD II 50 LP."])
+        self.assertEqual(await self.command("rank", "Nobody"), ["Nobody is not being tracked."])
+
+    async def test_matches(self):
+        self.assertEqual(
+            await self.command("matches", "TestPlayer"), ["EUW1_BOT0 EUW1_BOT1 EUW1_BOT2"]
+        )
+        self.assertEqual(
+            await self.command("matches", "Nobody"), ["Can't find summoner by that name"]
+        )
+
+    async def test_matches_pages(self):
+        ctx = MagicMock()
+        ctx.channel.send = AsyncMock()
+        with patch("bot.settings.BOT_MATCHES_PAGE_SIZE", 2):
+            await self.bot.get_command("matches").callback(ctx, "TestPlayer")
+        self.assertEqual(ctx.channel.send.call_args.args, ("EUW1_BOT0 EUW1_BOT1",))
+        view = ctx.channel.send.call_args.kwargs["view"]
+        self.assertTrue(view.previous.disabled)
+        self.assertFalse(view.next.disabled)
+
+        interaction = MagicMock()
+        interaction.response.edit_message = AsyncMock()
+        await view.next.callback(interaction)
+        self.assertEqual(interaction.response.edit_message.call_args.kwargs["content"], "EUW1_BOT2")
+        self.assertFalse(view.previous.disabled)
+        self.assertTrue(view.next.disabled)
+
+        await view.previous.callback(interaction)
+        self.assertEqual(
+            interaction.response.edit_message.call_args.kwargs["content"], "EUW1_BOT0 EUW1_BOT1"
+        )
+        self.assertTrue(view.previous.disabled)
+        view.stop()
+
+    async def test_matches_only_author_pages(self):
+        ctx = MagicMock()
+        ctx.channel.send = AsyncMock()
+        with patch("bot.settings.BOT_MATCHES_PAGE_SIZE", 2):
+            await self.bot.get_command("matches").callback(ctx, "TestPlayer")
+        view = ctx.channel.send.call_args.kwargs["view"]
+        interaction = MagicMock()
+        interaction.user.id = ctx.author.id
+        self.assertTrue(await view.interaction_check(interaction))
+        interaction.user.id = object()
+        self.assertFalse(await view.interaction_check(interaction))
+        view.stop()
+
+    async def test_matches_page_fits_one_message(self):
+        from bot import MatchesView
+
+        view = MatchesView(AsyncMock(), 1000, MagicMock())
+        self.assertLessEqual(view.size * 16, MESSAGE_LIMIT)
+        view.stop()
+
+    async def test_match_info_in_one_message(self):
+        await Match.objects.filter(match_id="EUW1_BOT1").aupdate(
+            triple_kills=1, first_blood_kill=True
+        )
+        self.assertEqual(
+            await self.command("match_info", "EUW1_BOT1"),
+            [
+                "TestPlayer went 1/1/2, 3.0 kda, 20 vision score.\n"
+                "TestPlayer with the Trip-Trip-Triple kill on Ahri! Let's go!\n"
+                "Bloodthirsty TestPlayer claimed first blood!"
+            ],
+        )
+
+    async def test_matches_none_recorded(self):
+        await Match.objects.filter(summoner=self.summoner).adelete()
+        self.assertEqual(
+            await self.command("matches", "TestPlayer"), ["No matches recorded yet for TestPlayer"]
+        )
+
+    async def test_match_info_and_last_match(self):
+        self.assertEqual(
+            await self.command("match_info", "EUW1_BOT1"),
+            ["TestPlayer went 1/1/2, 3.0 kda, 20 vision score."],
+        )
+        self.assertEqual(
+            await self.command("last_match", "TestPlayer"),
+            ["TestPlayer went 0/1/2, 2.0 kda, 20 vision score."],
+        )
+
+    async def test_recent(self):
+        messages = await self.command("recent", "TestPlayer")
+        self.assertIn("Over the last 3 games, TestPlayer", messages[0])
+        self.assertEqual(
+            await self.command("recent", "Nobody"), ["Can't find summoner by that name"]
+        )
+
+    async def test_rank_served_from_cache_until_new_match(self):
+        self.assertEqual(await self.command("rank", "TestPlayer"), ["TestPlayer is GOLD II 50 LP."])
+        await Summoner.objects.filter(pk=self.summoner.pk).aupdate(lp=99)
+        self.assertEqual(await self.command("rank", "TestPlayer"), ["TestPlayer is GOLD II 50 LP."])
+        # as poll() stores it from the cron
+        await Match.objects.acreate(
+            match_id="EUW1_BOT_NEWER",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime.now(timezone.utc),
+        )
+        summoner_cache.invalidate("TestPlayer", "EUW1_BOT_NEWER")
+        self.assertEqual(await self.command("rank", "TestPlayer"), ["TestPlayer is GOLD II 99 LP."])
+
+
+    async def test_track_looks_up_through_call_api(self):
+        with patch("bot.call_api") as mock_call_api:
+            mock_call_api.return_value.status_code = 404
+            self.assertEqual(
+                await self.command("track", "Unknown", "Player"),
+                ["Summoner by that name not found"],
+            )
+        mock_call_api.assert_called_once_with(
+            "https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-name/Unknown%20Player"
+        )
+
+class TestSummonerResponseCache(TestCase):
+    def setUp(self):
+        summoner_cache.get_cache().clear()
+        self.summoner = Summoner.objects.create(
+            name="Test Player",
+            summoner_id="sum123",
+            account_id="acc123",
+            puu_id="puu_response_cache",
+        )
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f"response {self.calls}"
+
+    def test_cached_per_latest_match(self):
+        Match.objects.create(
+            match_id="EUW1_C1",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime.now(timezone.utc),
+        )
+        self.assertEqual(summoner_cache.cached("rank", "Test Player", self.compute), "response 1")
+        self.assertEqual(summoner_cache.cached("rank", "Test Player", self.compute), "response 1")
+        self.assertEqual(summoner_cache.cached("recent", "Test Player", self.compute), "response 2")
+        Match.objects.create(
+            match_id="EUW1_C2",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime.now(timezone.utc),
+        )
+        # still on the pointer until poll() moves it
+        self.assertEqual(summoner_cache.cached("rank", "Test Player", self.compute), "response 1")
+        summoner_cache.invalidate("Test Player", "EUW1_C2")
+        self.assertEqual(summoner_cache.cached("rank", "Test Player", self.compute), "response 3")
+
+    def test_hit_skips_database(self):
+        Match.objects.create(
+            match_id="EUW1_C1",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime.now(timezone.utc),
+        )
+        summoner_cache.cached("rank", "Test Player", self.compute)
+        with self.assertNumQueries(0):
+            self.assertEqual(summoner_cache.cached("rank", "Test Player", self.compute), "response 1")
+
+    def test_no_matches_not_cached(self):
+        summoner_cache.cached("rank", "Test Player", self.compute)
+        summoner_cache.cached("rank", "Test Player", self.compute)
+        self.assertEqual(self.calls, 2)
+
+    def test_errors_not_cached(self):
+        Match.objects.create(
+            match_id="EUW1_C1",
+            summoner=self.summoner,
+            champion_name="Ahri",
+            start_time=datetime.now(timezone.utc),
+        )
+
+        def fail():
+            raise Summoner.DoesNotExist()
+
+        with self.assertRaises(Summoner.DoesNotExist):
+            summoner_cache.cached("rank", "Test Player", fail)
+        self.assertEqual(summoner_cache.cached("rank", "Test Player", self.compute), "response 1")
+
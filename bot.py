@@ -4,7 +4,6 @@ import discord
 from discord.ext import commands
 import logging
 import requests
-import textwrap
 import os
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "DomeTracker.settings")
@@ -13,9 +12,62 @@ from DomeTracker import settings
 import django
 
 django.setup()
-from apps.summoner.models import Summoner, RiotAPIException
+from apps.summoner.models import RollingStats, Summoner, RiotAPIException
 from apps.match.models import Match
-from asgiref.sync import sync_to_async
+from apps.summoner.cache import cached
+from bot_executor import DatabaseExecutor
+from riot_api import call_api
+from discord_webhook import DiscordWebhook, MESSAGE_LIMIT
+import asyncio
+
+
+class MatchesView(discord.ui.View):
+    # one page of match ids per message, fetched when it is shown. the
+    # cursors of the pages seen so far are kept so Previous is a keyset
+    # lookup too
+    def __init__(self, fetch, size, author, timeout=300):
+        super().__init__(timeout=timeout)
+        self.fetch = fetch
+        # a page has to fit in one message, ids are space separated
+        id_length = Match._meta.get_field("match_id").max_length + 1
+        self.size = max(1, min(size, MESSAGE_LIMIT // id_length))
+        self.author = author
+        self.cursors = [None]
+        self.rows = []
+        self.message = None
+
+    async def load(self):
+        # one extra row to know if there is a next page
+        rows = await self.fetch(self.cursors[-1], self.size + 1)
+        self.rows = rows[: self.size]
+        self.previous.disabled = len(self.cursors) == 1
+        self.next.disabled = len(rows) <= self.size
+        return self.content()
+
+    def content(self):
+        return " ".join(match_id for start_time, pk, match_id in self.rows)
+
+    def has_pages(self):
+        return not (self.previous.disabled and self.next.disabled)
+
+    async def interaction_check(self, interaction):
+        # only whoever asked pages through their matches
+        return interaction.user.id == self.author.id
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction, button):
+        self.cursors.pop()
+        await interaction.response.edit_message(content=await self.load(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction, button):
+        start_time, pk, match_id = self.rows[-1]
+        self.cursors.append((start_time, pk))
+        await interaction.response.edit_message(content=await self.load(), view=self)
+
+    async def on_timeout(self):
+        if self.message:
+            await self.message.edit(view=None)
 
 
 class YetAnotherBot(commands.Bot):
@@ -32,6 +84,7 @@ class YetAnotherBot(commands.Bot):
             logging.Formatter("%(asctime)s:%(levelname)s:%(name)s: %(message)s")
         )
         logger.addHandler(handler)
+        self.db = DatabaseExecutor()
         self.add_commands()
 
     # noinspection PyMethodMayBeStatic
@@ -50,24 +103,16 @@ class YetAnotherBot(commands.Bot):
         return requests.utils.quote(user_input)
 
     def add_commands(self):
-        stats_supported = [
-            "epic_steals",
-            "kills",
-            "deaths",
-            "assists",
-            "kda",
-            "win",
-            "vision_score",
-            "first_blood_kill",
-            "first_blood_assist",
-            "first_tower_kill",
-            "first_tower_assist",
-        ]
+        stats_supported = list(Summoner.weekly_stats())
 
         @self.event
         async def on_command_error(ctx, error):
             if isinstance(error, discord.ext.commands.errors.CommandNotFound):
                 await ctx.channel.send("That command wasn't found! Try $help")
+            elif isinstance(
+                error, discord.ext.commands.errors.CommandInvokeError
+            ) and isinstance(error.original, asyncio.TimeoutError):
+                await ctx.channel.send("That took too long, try again in a bit.")
 
         # @self.command(name="echo", pass_context=True)
         # async def echo(ctx):
@@ -75,16 +120,19 @@ class YetAnotherBot(commands.Bot):
         #         f"{ctx.author} in {ctx.channel}: {ctx.message.content}"
         #     )
 
+        # database work runs as plain functions on the bot's pool, see
+        # DatabaseExecutor
+
         def _get_ranked(name):
             try:
                 summ = Summoner.objects.get(name=name)
-                match = summ.match_set.order_by("-start_time").first()
-                if match:
-                    return f"{summ.name} is {match.rankedrecord}"
-                else:
-                    return f"{summ.name} has no ranked stats available yet"
             except Summoner.DoesNotExist:
                 return f"{name} is not being tracked."
+            ranked = summ.current_rank()
+            if ranked:
+                return f"{summ.name} is {ranked}"
+            else:
+                return f"{summ.name} has no ranked stats available yet"
 
         @self.command(
             brief="Shows current rank for Summoner '$rank Thelmkon'",
@@ -94,7 +142,9 @@ class YetAnotherBot(commands.Bot):
         async def rank(ctx, *args):
             name = YetAnotherBot.check_param(*args)
             if name:
-                ranked = await sync_to_async(_get_ranked)(name=name)
+                ranked = await self.db.run(
+                    "rank", cached, "rank", name, lambda: _get_ranked(name)
+                )
                 await ctx.channel.send(f"{ranked}")
             else:
                 await ctx.channel.send(f"Correct usage '$rank Thelmkon'")
@@ -106,16 +156,16 @@ class YetAnotherBot(commands.Bot):
             except Summoner.DoesNotExist:
                 if Summoner.objects.count() >= 20:
                     return "Hardcoded limit set to 20 summoners to limit API call load"
-                sum_req = requests.get(
-                    f"https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-name/{YetAnotherBot.sanitize(name)}",
-                    headers={"X-Riot-Token": settings.X_RIOT_TOKEN},
+                # through call_api so the bot shares the cron's rate limiter
+                sum_req = call_api(
+                    f"https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-name/{YetAnotherBot.sanitize(name)}"
                 )
                 if sum_req.status_code == 200:
                     try:
                         summ = Summoner.create_summoner(name)
-                        match = summ.match_set.last()
-                        if match:
-                            return f"Summoner added: {match.rankedrecord}"
+                        ranked = summ.current_rank()
+                        if ranked:
+                            return f"Summoner added: {ranked}"
                         else:
                             return f"Summoner added."
                     except RiotAPIException:
@@ -133,7 +183,7 @@ class YetAnotherBot(commands.Bot):
         async def track(ctx, *args):
             name = YetAnotherBot.check_param(*args)
             if name:
-                tracked = await sync_to_async(_track_summoner)(name=name)
+                tracked = await self.db.run("track", _track_summoner, name=name)
                 await ctx.channel.send(f"{tracked}")
             else:
                 await ctx.channel.send(f"Correct usage '$track Thelmkon'")
@@ -152,7 +202,9 @@ class YetAnotherBot(commands.Bot):
             name = YetAnotherBot.check_param(*args)
             if name:
                 try:
-                    graph_res = await sync_to_async(_graph)(name=name)
+                    graph_res = await self.db.run(
+                        "graph", cached, "graph", name, lambda: _graph(name)
+                    )
                     if graph_res:
                         if graph_res == "No ranked record available":
                             await ctx.channel.send(graph_res)
@@ -165,14 +217,16 @@ class YetAnotherBot(commands.Bot):
             else:
                 await ctx.channel.send(f"Correct usage '$graph Thelmkon'")
 
-        def _matches(name):
-            summ = Summoner.objects.get(name=name)
-            if not summ.match_set.last():
-                return f"No matches recorded yet for {name}"
-            val = " ".join(
-                [ma.match_id for ma in summ.match_set.order_by("-start_time")]
+        def _matches(name, cursor, size):
+            rows = list(
+                Match.newest_first(
+                    Match.objects.filter(summoner__name=name), cursor
+                ).values_list("start_time", "pk", "match_id")[:size]
             )
-            return f"{val}"
+            if not rows and not cursor:
+                if not Summoner.objects.filter(name=name).exists():
+                    raise Summoner.DoesNotExist()
+            return rows
 
         @self.command(
             brief="Show recorded matches for summoner",
@@ -183,11 +237,21 @@ class YetAnotherBot(commands.Bot):
             name = YetAnotherBot.check_param(*args)
             if name:
                 try:
-                    match_list = await sync_to_async(_matches)(name=name)
-                    if match_list:
-                        lines = textwrap.wrap(match_list, 2000)
-                        for line in lines:
-                            await ctx.channel.send(line)
+                    view = MatchesView(
+                        lambda cursor, size: self.db.run(
+                            "matches", _matches, name, cursor, size
+                        ),
+                        settings.BOT_MATCHES_PAGE_SIZE,
+                        ctx.author,
+                    )
+                    page = await view.load()
+                    if not page:
+                        await ctx.channel.send(f"No matches recorded yet for {name}")
+                    elif view.has_pages():
+                        view.message = await ctx.channel.send(page, view=view)
+                    else:
+                        view.stop()
+                        await ctx.channel.send(page)
                 except Summoner.DoesNotExist:
                     await ctx.channel.send(f"Can't find summoner by that name")
             else:
@@ -195,8 +259,9 @@ class YetAnotherBot(commands.Bot):
 
         def _match_info(match_id):
             events = []
-            match_list = Match.objects.filter(match_id=match_id)
-            for match in match_list:
+            for match in Match.objects.filter(match_id=match_id).select_related(
+                "summoner"
+            ):
                 events += match.events()
             return events
 
@@ -209,21 +274,28 @@ class YetAnotherBot(commands.Bot):
             match_id = YetAnotherBot.check_param(*args, min_length=1, max_length=1)
             if match_id:
                 try:
-                    match_events = await sync_to_async(_match_info)(match_id=match_id)
-                    for event in match_events:
-                        await ctx.channel.send(event)
+                    match_events = await self.db.run(
+                        "match_info", _match_info, match_id
+                    )
+                    for message in DiscordWebhook.pack(match_events):
+                        await ctx.channel.send(message)
                 except Summoner.DoesNotExist:
                     await ctx.channel.send(f"Can't find match by that ID")
             else:
                 await ctx.channel.send(f"Correct usage '$match_info EUW1_5889986459")
 
         def _last_match(name):
-            summ = Summoner.objects.get(name=name)
-            if not summ.match_set.last():
-                return f"No matches recorded yet for {name}."
-            match_id = summ.match_set.order_by("-start_time").first().match_id
-            val = _match_info(match_id)
-            return val
+            match = (
+                Match.objects.filter(summoner__name=name)
+                .select_related("summoner")
+                .order_by("-start_time")
+                .first()
+            )
+            if not match:
+                if not Summoner.objects.filter(name=name).exists():
+                    raise Summoner.DoesNotExist()
+                return [f"No matches recorded yet for {name}."]
+            return match.events()
 
         @self.command(
             brief="Show match info for last recorded match for summoner",
@@ -234,17 +306,24 @@ class YetAnotherBot(commands.Bot):
             name = YetAnotherBot.check_param(*args)
             if name:
                 try:
-                    match_events = await sync_to_async(_last_match)(name=name)
-                    for event in match_events:
-                        await ctx.channel.send(event)
+                    match_events = await self.db.run("last_match", _last_match, name)
+                    for message in DiscordWebhook.pack(match_events):
+                        await ctx.channel.send(message)
                 except Summoner.DoesNotExist:
                     await ctx.channel.send(f"Can't find summoner by that name")
             else:
                 await ctx.channel.send(f"Correct usage '$last_match Thelmkon")
 
         def _recent(name):
-            summ = Summoner.objects.get(name=name)
-            return summ.recent_stats()
+            stats = (
+                RollingStats.objects.filter(summoner__name=name)
+                .select_related("summoner")
+                .first()
+            )
+            if stats:
+                return stats.summoner.recent_stats(stats)
+            # not built yet for this summoner, or not tracked at all
+            return Summoner.objects.get(name=name).recent_stats()
 
         @self.command(
             brief="Show stats for recent matches for summoner",
@@ -255,7 +334,9 @@ class YetAnotherBot(commands.Bot):
             name = YetAnotherBot.check_param(*args)
             if name:
                 try:
-                    stats = await sync_to_async(_recent)(name=name)
+                    stats = await self.db.run(
+                        "recent", cached, "recent", name, lambda: _recent(name)
+                    )
                     await ctx.channel.send(stats)
                 except Summoner.DoesNotExist:
                     await ctx.channel.send(f"Can't find summoner by that name")
@@ -264,19 +345,13 @@ class YetAnotherBot(commands.Bot):
 
         def _weekly(stat):
             if stat in stats_supported:
-                rankings = []
-                for summ in Summoner.objects.all():
-                    week = summ.get_weekly()
-                    if week:
-                        rankings.append((summ.name, week))
                 if stat == "vision_score":
                     keyword = "average"
                 elif stat == "kda":
                     keyword = "top"
                 else:
                     keyword = "total"
-                results = [(s[0], s[1][stat]) for s in rankings if s[1][stat] != 0]
-                results.sort(key=lambda tup: tup[1], reverse=True)
+                results = Summoner.weekly_leaderboard(stat)
                 printable = [f"{s[0]}: {s[1]}" for s in results]
                 return f"Showing {keyword} {stat} over the last 7 days:\n" + "\n".join(
                     printable
@@ -293,7 +368,7 @@ class YetAnotherBot(commands.Bot):
             if not stat:
                 await ctx.channel.send(f"Supported stats: {' '.join(stats_supported)}.")
                 return
-            results = await sync_to_async(_weekly)(stat=stat)
+            results = await self.db.run("weekly", _weekly, stat=stat)
             if results:
                 await ctx.channel.send(results)
             else:
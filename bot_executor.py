@@ -0,0 +1,57 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class DatabaseExecutor:
+    # runs the bot's ORM work on a bounded pool of its own. sync_to_async with
+    # thread_sensitive=True puts every command on one shared thread, so a slow
+    # $weekly held up every $rank behind it
+    def __init__(self, workers=None, timeout=None, timeouts=None):
+        self.workers = workers or settings.BOT_DB_WORKERS
+        self.timeout = timeout or settings.BOT_COMMAND_TIMEOUT
+        self.timeouts = (
+            timeouts
+            if timeouts is not None
+            else DatabaseExecutor.parse(settings.BOT_COMMAND_TIMEOUTS)
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="bot-db"
+        )
+
+    @staticmethod
+    def parse(timeouts):
+        # "weekly:30,graph:20", seconds per command name
+        result = {}
+        for entry in timeouts.split(","):
+            if entry:
+                name, seconds = entry.split(":")
+                result[name.strip()] = float(seconds)
+        return result
+
+    def timeout_for(self, command):
+        return self.timeouts.get(command, self.timeout)
+
+    @staticmethod
+    def call(func, *args, **kwargs):
+        # the same connection handling Django gives a request, the worker
+        # keeps its connection for as long as CONN_MAX_AGE allows
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    async def run(self, command, func, *args, **kwargs):
+        # raises asyncio.TimeoutError once the command's time is up, the worker
+        # finishes the call in the background
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor, partial(DatabaseExecutor.call, func, *args, **kwargs)
+        )
+        return await asyncio.wait_for(future, self.timeout_for(command))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -2,8 +2,35 @@ import requests
 import json
 import mimetypes
 
+# Discord rejects message content longer than this
+MESSAGE_LIMIT = 2000
+
 
 class DiscordWebhook:
+    @staticmethod
+    def pack(lines, limit=MESSAGE_LIMIT):
+        # joins lines into as few messages as fit under the limit, in order.
+        # a line that is too long by itself is split over several messages
+        messages = []
+        message = ""
+        for line in lines:
+            line = f"{line}"
+            while len(line) > limit:
+                if message:
+                    messages.append(message)
+                    message = ""
+                messages.append(line[:limit])
+                line = line[limit:]
+            if message and len(message) + 1 + len(line) <= limit:
+                message = f"{message}\n{line}"
+            else:
+                if message:
+                    messages.append(message)
+                message = line
+        if message:
+            messages.append(message)
+        return messages
+
     @staticmethod
     def post_to_discord(webhook, message):
         body = {"content": f"{message}"}
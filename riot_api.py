@@ -1,19 +1,138 @@
 import requests
 from django.conf import settings
 from discord_webhook import DiscordWebhook
+from urllib.parse import urlparse
+import threading
 import time
 
 
+class RateBucket:
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.count = 0
+        self.window_start = 0.0
+
+    def delay(self, now):
+        if now - self.window_start >= self.window:
+            self.count = 0
+            self.window_start = now
+        if self.count >= self.limit:
+            return self.window_start + self.window - now
+        return 0
+
+    def sync(self, count, now):
+        if now - self.window_start >= self.window:
+            self.count = 0
+            self.window_start = now
+        # keep our own count if requests are still in flight
+        self.count = max(self.count, count)
+
+
+class RateLimiter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.blocked_until = {}
+
+    @staticmethod
+    def parse(header):
+        # "20:1,100:120" -> [(20, 1), (100, 120)]
+        if not header:
+            return []
+        pairs = []
+        for part in header.split(","):
+            value, window = part.split(":")
+            pairs.append((int(value), int(window)))
+        return pairs
+
+    @staticmethod
+    def scopes(url):
+        # app limits apply per routing host, method limits per API (e.g. match-v5)
+        parsed = urlparse(url)
+        parts = parsed.path.strip("/").split("/")
+        method = "-".join(parts[1:3]) if len(parts) > 2 else parsed.path
+        return (parsed.netloc, "app"), (parsed.netloc, method)
+
+    def reserve(self, url):
+        # returns 0 once a slot is taken, otherwise the seconds to wait first
+        app, method = self.scopes(url)
+        with self.lock:
+            now = time.monotonic()
+            if app not in self.buckets:
+                self.buckets[app] = {
+                    window: RateBucket(limit, window)
+                    for limit, window in self.parse(settings.RIOT_APP_RATE_LIMIT)
+                }
+            buckets = list(self.buckets[app].values()) + list(
+                self.buckets.get(method, {}).values()
+            )
+            wait = max(
+                [self.blocked_until.get(scope, 0) - now for scope in (app, method)]
+                + [bucket.delay(now) for bucket in buckets]
+            )
+            if wait > 0:
+                return wait
+            for bucket in buckets:
+                bucket.count += 1
+            return 0
+
+    def acquire(self, url):
+        wait = self.reserve(url)
+        while wait:
+            time.sleep(wait)
+            wait = self.reserve(url)
+
+    def update(self, url, headers):
+        app, method = self.scopes(url)
+        with self.lock:
+            now = time.monotonic()
+            for scope, header in (
+                (app, "X-App-Rate-Limit"),
+                (method, "X-Method-Rate-Limit"),
+            ):
+                limits = self.parse(headers.get(header))
+                counts = {
+                    window: count
+                    for count, window in self.parse(headers.get(f"{header}-Count"))
+                }
+                if not limits:
+                    continue
+                # the reported windows replace the seeded ones, counts carry
+                # over for windows we already track
+                old = self.buckets.get(scope, {})
+                buckets = {}
+                for limit, window in limits:
+                    bucket = old.get(window) or RateBucket(limit, window)
+                    bucket.limit = limit
+                    bucket.sync(counts.get(window, 0), now)
+                    buckets[window] = bucket
+                self.buckets[scope] = buckets
+
+    def penalize(self, url, headers):
+        app, method = self.scopes(url)
+        scope = app if headers.get("X-Rate-Limit-Type") == "application" else method
+        retry_after = int(headers.get("Retry-After") or settings.RIOT_RETRY_AFTER)
+        with self.lock:
+            self.blocked_until[scope] = time.monotonic() + retry_after
+
+
+limiter = RateLimiter()
+
+
 def call_api(url):
-    req = requests.get(
-        url,
-        headers={"X-Riot-Token": settings.X_RIOT_TOKEN},
-    )
-    if req.status_code == 429:
+    while True:
+        limiter.acquire(url)
+        req = requests.get(
+            url,
+            headers={"X-Riot-Token": settings.X_RIOT_TOKEN},
+        )
+        limiter.update(url, req.headers)
+        if req.status_code != 429:
+            break
         DiscordWebhook.post_to_me(settings.DISCORD_ERROR_HOOK, "Ratelimiting hit")
-        time.sleep(60)
-        return call_api(url)
-    elif req.status_code != 200:
+        limiter.penalize(url, req.headers)
+    if req.status_code != 200:
         DiscordWebhook.post_to_me(
             settings.DISCORD_ERROR_HOOK, f"API error {req.status_code}: {req.json()}"
         )
@@ -0,0 +1,136 @@
+import aiohttp
+import asyncio
+import threading
+from django.conf import settings
+from discord_webhook import DiscordWebhook
+import riot_api
+
+PLATFORM_HOST = "https://euw1.api.riotgames.com"
+REGION_HOST = "https://europe.api.riotgames.com"
+
+
+class RiotResponse:
+    def __init__(self, url, status_code, headers, data):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class RiotClient:
+    def __init__(self, pool_size=20, keepalive=60, timeout=30):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.session = None
+        self.loop = None
+
+    async def get_session(self):
+        # sessions are bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self.loop is not loop:
+            self.session = aiohttp.ClientSession(
+                headers={"X-Riot-Token": settings.X_RIOT_TOKEN},
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, keepalive_timeout=self.keepalive
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self.loop = loop
+        return self.session
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.loop = None
+
+    async def call_api(self, url):
+        session = await self.get_session()
+        while True:
+            wait = riot_api.limiter.reserve(url)
+            while wait:
+                await asyncio.sleep(wait)
+                wait = riot_api.limiter.reserve(url)
+            async with session.get(url) as resp:
+                try:
+                    data = await resp.json(content_type=None)
+                except ValueError:
+                    data = await resp.text()
+                req = RiotResponse(url, resp.status, resp.headers, data)
+            riot_api.limiter.update(url, req.headers)
+            if req.status_code != 429:
+                break
+            await asyncio.to_thread(
+                DiscordWebhook.post_to_me,
+                settings.DISCORD_ERROR_HOOK,
+                "Ratelimiting hit",
+            )
+            riot_api.limiter.penalize(url, req.headers)
+        if req.status_code != 200:
+            await asyncio.to_thread(
+                DiscordWebhook.post_to_me,
+                settings.DISCORD_ERROR_HOOK,
+                f"API error {req.status_code}: {req.json()}",
+            )
+        return req
+
+    async def get_summoner_by_puuid(self, puuid):
+        return await self.call_api(
+            f"{PLATFORM_HOST}/lol/summoner/v4/summoners/by-puuid/{puuid}"
+        )
+
+    async def get_summoner_by_name(self, name):
+        return await self.call_api(
+            f"{PLATFORM_HOST}/lol/summoner/v4/summoners/by-name/{name}"
+        )
+
+    async def get_league_entries(self, summoner_id):
+        return await self.call_api(
+            f"{PLATFORM_HOST}/lol/league/v4/entries/by-summoner/{summoner_id}"
+        )
+
+    async def get_match_ids(self, puuid, start=0, count=1, queue=420):
+        return await self.call_api(
+            f"{REGION_HOST}/lol/match/v5/matches/by-puuid/{puuid}/ids?start={start}&count={count}&queue={queue}"
+        )
+
+    async def get_match(self, match_id):
+        return await self.call_api(f"{REGION_HOST}/lol/match/v5/matches/{match_id}")
+
+    async def get_matches(self, match_ids):
+        return await asyncio.gather(*[self.get_match(m) for m in match_ids])
+
+
+# one loop and client per thread, so keep-alive connections are reused by
+# every poll a worker thread runs
+local = threading.local()
+clients = []
+clients_lock = threading.Lock()
+
+
+def get_client():
+    if not hasattr(local, "client"):
+        local.loop = asyncio.new_event_loop()
+        local.client = RiotClient()
+        with clients_lock:
+            clients.append((local.loop, local.client))
+    return local.loop, local.client
+
+
+def close_clients():
+    # once the worker threads are done with them
+    with clients_lock:
+        while clients:
+            loop, client = clients.pop()
+            loop.run_until_complete(client.close())
+            loop.close()
+
+
+def fetch_matches(match_ids):
+    # for sync callers, which may run on worker threads without a loop
+    loop, client = get_client()
+    return loop.run_until_complete(client.get_matches(match_ids))
@@ -0,0 +1,115 @@
+from apps.match.models import Match
+from apps.summoner.models import Summoner
+from django.db import connection, transaction
+from datetime import datetime, timedelta, timezone
+import random
+import statistics
+import time
+
+
+def queries(summoner, match_id):
+    # the access paths of $recent, $weekly, the last match and $match_info
+    return {
+        "recent": summoner.match_set.order_by("-start_time")[:10],
+        "weekly": summoner.match_set.filter(start_time__range=Summoner.week_range()),
+        "last": summoner.match_set.order_by("-start_time")[:1],
+        "match_info": Match.objects.filter(match_id=match_id),
+    }
+
+
+def populate(rows, summoners, batch_size=10000):
+    players = Summoner.objects.bulk_create(
+        [
+            Summoner(
+                name=f"Bench{i}",
+                summoner_id=f"bench{i}",
+                account_id=f"bench{i}",
+                puu_id=f"benchmark_{i}",
+            )
+            for i in range(summoners)
+        ]
+    )
+    now = datetime.now(timezone.utc)
+    for start in range(0, rows, batch_size):
+        # bulk_create skips post_save, so the stats tables are left alone
+        Match.objects.bulk_create(
+            [
+                Match(
+                    match_id=f"BENCH_{i}",
+                    summoner=random.choice(players),
+                    champion_name="Ahri",
+                    kills=random.randint(0, 20),
+                    kda=random.random() * 10,
+                    start_time=now - timedelta(minutes=random.randint(0, 2000000)),
+                )
+                for i in range(start, min(start + batch_size, rows))
+            ]
+        )
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # pending foreign key checks on the new rows block index changes
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute("ANALYZE")
+    return players
+
+
+def measure(players, rows, repeat):
+    results = {}
+    for name in queries(players[0], "BENCH_0"):
+        timings = []
+        for _ in range(repeat):
+            summoner = random.choice(players)
+            queryset = queries(summoner, f"BENCH_{random.randrange(rows)}")[name]
+            start = time.perf_counter()
+            list(queryset)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (queryset.explain(), statistics.median(timings))
+    return results
+
+
+def set_indexes(create):
+    # plain statements, the schema editor refuses to run inside atomic on sqlite
+    editor = connection.schema_editor()
+    with connection.cursor() as cursor:
+        for index in Match._meta.indexes:
+            sql = (
+                index.create_sql(Match, editor)
+                if create
+                else index.remove_sql(Match, editor)
+            )
+            cursor.execute(str(sql))
+        cursor.execute("ANALYZE")
+
+
+def compare(rows, summoners, repeat):
+    # compares the hot queries without and with the Match indexes on a
+    # synthetic match table, everything is rolled back afterwards
+    with transaction.atomic():
+        start = time.monotonic()
+        players = populate(rows, summoners)
+        print(f"Inserted {rows} matches in {time.monotonic() - start:.1f}s")
+        set_indexes(create=False)
+        before = measure(players, rows, repeat)
+        set_indexes(create=True)
+        after = measure(players, rows, repeat)
+        transaction.set_rollback(True)
+    for name in before:
+        print(f"{name}: {before[name][1]:.3f}ms -> {after[name][1]:.3f}ms")
+        print(f"  before: {before[name][0]}")
+        print(f"  after:  {after[name][0]}")
+    return {name: (before[name][1], after[name][1]) for name in before}
+
+
+def run(*args):
+    # runs on a throwaway test_<NAME> database created from the migrations,
+    # never on the live tables, dropping their indexes would lock out the
+    # cron and the bot for the whole run
+    rows = int(args[0]) if args else 1000000
+    summoners = int(args[1]) if len(args) > 1 else 100
+    repeat = int(args[2]) if len(args) > 2 else 20
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        return compare(rows, summoners, repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
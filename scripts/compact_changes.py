@@ -0,0 +1,17 @@
+from apps.change.retention import compact
+from django.conf import settings
+import time
+
+
+def run(*args):
+    # runscript compact_changes [days] [per object], defaults from settings
+    days = int(args[0]) if args else settings.CHANGE_RETENTION_DAYS
+    keep = int(args[1]) if len(args) > 1 else settings.CHANGE_RETENTION_PER_OBJECT
+    start = time.monotonic()
+    result = compact(days=days, keep=keep)
+    elapsed = time.monotonic() - start
+    print(
+        f"Removed {result['noops']} no-op, {result['expired']} expired and "
+        f"{result['excess']} excess changes in {elapsed:.2f}s"
+    )
+    return result
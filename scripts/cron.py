@@ -1,13 +1,33 @@
+from apps.change.models import Change
 from apps.summoner.models import Summoner
 from discord_webhook import DiscordWebhook
 from django.conf import settings
+from django.db import connection
+from riot_api_async import close_clients
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 
-def run():
-    for summ in Summoner.objects.all():
-        time.sleep(1)
-        try:
-            summ.poll()
-        except Exception as e:
-            DiscordWebhook.post_to_me(settings.DISCORD_ERROR_HOOK, e)
+def poll(summ):
+    try:
+        found = summ.poll()
+        summ.schedule_next_poll(found)
+    except Exception as e:
+        DiscordWebhook.post_to_me(settings.DISCORD_ERROR_HOOK, e)
+    finally:
+        # every worker thread opens its own connection
+        connection.close()
+
+
+def run(*args):
+    # the shared rate limiter in riot_api keeps the workers within budget
+    workers = int(args[0]) if args else settings.POLL_WORKERS
+    start = time.monotonic()
+    summoners = list(Summoner.due_for_poll())
+    # audit rows of the whole cycle go out in one insert
+    with Change.buffered(), ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(poll, summoners))
+    close_clients()
+    elapsed = time.monotonic() - start
+    print(f"Polled {len(summoners)} summoners in {elapsed:.2f}s ({workers} workers)")
+    return elapsed
@@ -0,0 +1,80 @@
+from asgiref.sync import sync_to_async
+from bot_executor import DatabaseExecutor
+import asyncio
+import random
+import statistics
+import time
+
+
+def query(seconds):
+    # stands in for a command's ORM work, waiting on the database like a
+    # query does
+    time.sleep(seconds)
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return max(values, default=0)
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+async def burst(dispatch, commands):
+    async def command(name, seconds):
+        start = time.perf_counter()
+        await dispatch(name, seconds)
+        return name, time.perf_counter() - start
+
+    return await asyncio.gather(*(command(*entry) for entry in commands))
+
+
+def make_commands(size, slow_share, fast, slow):
+    return [
+        ("weekly", slow) if random.random() < slow_share else ("rank", fast)
+        for _ in range(size)
+    ]
+
+
+def measure(dispatch, bursts, size, slow_share, fast, slow):
+    async def main():
+        latencies = {"rank": [], "weekly": []}
+        for _ in range(bursts):
+            for name, latency in await burst(
+                dispatch, make_commands(size, slow_share, fast, slow)
+            ):
+                latencies[name].append(latency * 1000)
+        return latencies
+
+    return asyncio.run(main())
+
+
+def run(*args):
+    # runscript load_test_bot [bursts] [commands per burst] [workers]
+    # compares the old single thread_sensitive thread with DatabaseExecutor
+    # on bursts of fast $rank lookups mixed with slow $weekly aggregates
+    bursts = int(args[0]) if args else 20
+    size = int(args[1]) if len(args) > 1 else 50
+    workers = int(args[2]) if len(args) > 2 else 8
+    slow_share, fast, slow = 0.1, 0.005, 0.1
+    executor = DatabaseExecutor(workers=workers, timeout=60, timeouts={})
+
+    async def thread_sensitive(name, seconds):
+        await sync_to_async(query)(seconds)
+
+    async def pooled(name, seconds):
+        await executor.run(name, query, seconds)
+
+    results = {}
+    for label, dispatch in (
+        ("thread_sensitive", thread_sensitive),
+        (f"executor({workers})", pooled),
+    ):
+        random.seed(0)
+        latencies = measure(dispatch, bursts, size, slow_share, fast, slow)
+        results[label] = {
+            name: (percentile(values, 50), percentile(values, 95))
+            for name, values in latencies.items()
+        }
+        for name, (p50, p95) in results[label].items():
+            print(f"{label} {name}: p50 {p50:.1f}ms p95 {p95:.1f}ms")
+    executor.shutdown()
+    return results
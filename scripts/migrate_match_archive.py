@@ -0,0 +1,40 @@
+from apps.match.archive import get_archive
+from django.utils.module_loading import import_string
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+import os
+import time
+
+
+@lru_cache(maxsize=None)
+def open_source(backend, path):
+    return import_string(backend)(path)
+
+
+def convert(backend, path, match_id):
+    archive = get_archive()
+    # skip payloads converted by an earlier, interrupted run
+    if not archive.contains(match_id):
+        archive.write(match_id, open_source(backend, path).read(match_id))
+    return match_id
+
+
+def run(*args):
+    # converts the payloads under <source> (flat <match_id>.json files unless
+    # another archive backend is given) into the configured archive, the
+    # originals are left in place
+    path = args[0] if args else os.path.join(os.getcwd(), "matches")
+    workers = int(args[1]) if len(args) > 1 else os.cpu_count()
+    backend = args[2] if len(args) > 2 else "apps.match.archive.FlatJsonArchive"
+    start = time.monotonic()
+    match_ids = list(open_source(backend, path).match_ids())
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        converted = list(
+            executor.map(
+                convert, repeat(backend), repeat(path), match_ids, chunksize=64
+            )
+        )
+    elapsed = time.monotonic() - start
+    print(f"Converted {len(converted)} matches from {path} in {elapsed:.2f}s")
+    return len(converted)
@@ -0,0 +1,16 @@
+from apps.change.retention import is_partitioned, partition_table
+from django.db import connection
+
+
+def run(*args):
+    # one-off, moves the Change table onto monthly partitions. compact_changes
+    # keeps creating the upcoming months and drops expired ones whole
+    if connection.vendor != "postgresql":
+        print("Partitioning needs PostgreSQL")
+        return False
+    if is_partitioned():
+        print("Already partitioned")
+        return False
+    partition_table()
+    print("Change table partitioned by month")
+    return True
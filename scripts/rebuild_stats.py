@@ -0,0 +1,20 @@
+from apps.summoner.models import RollingStats, Summoner
+from django.db import transaction
+import time
+
+
+def run(*args):
+    # recomputes the daily buckets and rolling stats from the match table, for
+    # after matches were deleted or edited outside of Match.create_match
+    start = time.monotonic()
+    summoners = Summoner.objects.all()
+    if args:
+        summoners = summoners.filter(name__in=args)
+    count = 0
+    for summoner in summoners:
+        with transaction.atomic():
+            RollingStats.rebuild(summoner)
+        count += 1
+    elapsed = time.monotonic() - start
+    print(f"Rebuilt stats for {count} summoners in {elapsed:.2f}s")
+    return count
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "DomeTracker.settings")
+
+import django
+
+django.setup()
+
+from bot_executor import DatabaseExecutor
+
+
+@patch("bot_executor.close_old_connections")
+class TestDatabaseExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = DatabaseExecutor(
+            workers=2, timeout=5, timeouts={"weekly": 0.05}
+        )
+        self.addCleanup(self.executor.shutdown)
+
+    def test_returns_result(self, mock_close):
+        result = asyncio.run(
+            self.executor.run("rank", lambda name: f"{name} ranked", name="Thelmkon")
+        )
+        self.assertEqual(result, "Thelmkon ranked")
+        self.assertEqual(mock_close.call_count, 2)
+
+    def test_commands_run_concurrently(self, mock_close):
+        # both calls have to be in flight at once to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        async def main():
+            return await asyncio.gather(
+                self.executor.run("rank", barrier.wait),
+                self.executor.run("recent", barrier.wait),
+            )
+
+        self.assertEqual(sorted(asyncio.run(main())), [0, 1])
+
+    def test_per_command_timeout(self, mock_close):
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(self.executor.run("weekly", time.sleep, 0.5))
+
+    def test_errors_propagate(self, mock_close):
+        def fail():
+            raise ValueError("bad")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.executor.run("rank", fail))
+        self.assertEqual(mock_close.call_count, 2)
+
+
+class TestParse(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(
+            DatabaseExecutor.parse("weekly:30, graph:2.5"),
+            {"weekly": 30.0, "graph": 2.5},
+        )
+
+    def test_parse_empty(self):
+        self.assertEqual(DatabaseExecutor.parse(""), {})
+
+
+@patch("scripts.load_test_bot.print", create=True)
+class TestLoadTest(unittest.TestCase):
+    def test_pool_beats_single_thread(self, mock_print):
+        from scripts.load_test_bot import run
+
+        results = run(2, 20, 8)
+        self.assertLess(
+            results["executor(8)"]["rank"][1], results["thread_sensitive"]["rank"][1]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
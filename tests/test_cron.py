@@ -0,0 +1,83 @@
+import os
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "DomeTracker.settings")
+
+import django
+
+django.setup()
+
+from scripts import cron
+
+
+class TestRun(unittest.TestCase):
+    @patch("scripts.cron.DiscordWebhook")
+    @patch("scripts.cron.Summoner")
+    def test_polls_every_summoner(self, mock_summoner, mock_webhook):
+        summoners = [MagicMock() for _ in range(5)]
+        mock_summoner.due_for_poll.return_value = summoners
+
+        cron.run(2)
+
+        for summ in summoners:
+            summ.poll.assert_called_once()
+        mock_webhook.post_to_me.assert_not_called()
+
+    @patch("scripts.cron.DiscordWebhook")
+    @patch("scripts.cron.Summoner")
+    def test_polls_concurrently(self, mock_summoner, mock_webhook):
+        # both polls have to be in flight at once to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+        summoners = [MagicMock() for _ in range(2)]
+        for summ in summoners:
+            summ.poll.side_effect = barrier.wait
+        mock_summoner.due_for_poll.return_value = summoners
+
+        cron.run(2)
+
+        mock_webhook.post_to_me.assert_not_called()
+
+    @patch("scripts.cron.DiscordWebhook")
+    @patch("scripts.cron.Summoner")
+    def test_error_reported_and_others_polled(self, mock_summoner, mock_webhook):
+        failing = MagicMock()
+        failing.poll.side_effect = Exception("API down")
+        other = MagicMock()
+        mock_summoner.due_for_poll.return_value = [failing, other]
+
+        cron.run(1)
+
+        other.poll.assert_called_once()
+        mock_webhook.post_to_me.assert_called_once()
+
+    @patch("scripts.cron.DiscordWebhook")
+    @patch("scripts.cron.Change")
+    @patch("scripts.cron.Summoner")
+    def test_polls_inside_one_change_buffer(
+        self, mock_summoner, mock_change, mock_webhook
+    ):
+        summ = MagicMock()
+        summ.poll.side_effect = (
+            lambda: mock_change.buffered.return_value.__exit__.assert_not_called()
+        )
+        mock_summoner.due_for_poll.return_value = [summ]
+
+        cron.run(1)
+
+        summ.poll.assert_called_once()
+        mock_webhook.post_to_me.assert_not_called()
+        mock_change.buffered.return_value.__exit__.assert_called_once()
+
+    @patch("scripts.cron.Summoner")
+    def test_returns_wall_time(self, mock_summoner):
+        mock_summoner.due_for_poll.return_value = []
+
+        elapsed = cron.run()
+
+        self.assertGreaterEqual(elapsed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
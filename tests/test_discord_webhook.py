@@ -71,5 +71,34 @@ class TestPostImageToDiscord(unittest.TestCase):
         mock_post.assert_not_called()
 
 
+class TestPack(unittest.TestCase):
+    def test_joins_lines_into_one_message(self):
+        self.assertEqual(DiscordWebhook.pack(["a", "b", "c"]), ["a\nb\nc"])
+
+    def test_starts_a_new_message_at_the_limit(self):
+        self.assertEqual(
+            DiscordWebhook.pack(["aaaa", "bbbb", "cc"], limit=9), ["aaaa\nbbbb", "cc"]
+        )
+        self.assertEqual(
+            DiscordWebhook.pack(["aaaa", "bbbbb"], limit=9), ["aaaa", "bbbbb"]
+        )
+
+    def test_splits_a_line_over_the_limit(self):
+        self.assertEqual(
+            DiscordWebhook.pack(["a", "bbbbbbb", "c"], limit=3),
+            ["a", "bbb", "bbb", "b\nc"],
+        )
+
+    def test_every_message_fits(self):
+        lines = [f"event {i} " * 20 for i in range(50)]
+        messages = DiscordWebhook.pack(lines)
+        self.assertTrue(all(len(message) <= 2000 for message in messages))
+        self.assertEqual("\n".join(messages), "\n".join(lines))
+        self.assertEqual(len(messages), 5)
+
+    def test_nothing_to_send(self):
+        self.assertEqual(DiscordWebhook.pack([]), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "DomeTracker.settings")
+
+import django
+
+django.setup()
+
+from django.test import override_settings
+from apps.match.archive import get_archive
+from scripts import migrate_match_archive
+
+
+class TestRun(unittest.TestCase):
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        target = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(target.cleanup)
+        self.source = source.name
+        settings_patch = override_settings(MATCH_ARCHIVE_ROOT=target.name)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        for i in range(5):
+            with open(os.path.join(self.source, f"EUW1_{i}.json"), "w") as f:
+                json.dump({"info": {"gameId": i}}, f)
+
+    def test_converts_all_matches(self):
+        converted = migrate_match_archive.run(self.source, 2)
+
+        self.assertEqual(converted, 5)
+        archive = get_archive()
+        self.assertEqual(sorted(archive.match_ids()), [f"EUW1_{i}" for i in range(5)])
+        self.assertEqual(archive.read("EUW1_3"), {"info": {"gameId": 3}})
+        # originals are kept
+        self.assertTrue(os.path.exists(os.path.join(self.source, "EUW1_3.json")))
+
+    def test_rerun_skips_converted(self):
+        migrate_match_archive.run(self.source, 2)
+        path = get_archive().path("EUW1_0")
+        modified = os.path.getmtime(path)
+
+        migrate_match_archive.run(self.source, 2)
+
+        self.assertEqual(os.path.getmtime(path), modified)
+
+    def test_converts_into_pack(self):
+        with override_settings(
+            MATCH_ARCHIVE_BACKEND="apps.match.archive.PackedArchive"
+        ):
+            converted = migrate_match_archive.run(self.source, 3)
+            archive = get_archive()
+            self.assertEqual(converted, 5)
+            self.assertEqual(
+                sorted(archive.match_ids()), [f"EUW1_{i}" for i in range(5)]
+            )
+            self.assertEqual(archive.read("EUW1_4"), {"info": {"gameId": 4}})
+
+
+if __name__ == "__main__":
+    unittest.main()
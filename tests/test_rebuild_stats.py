@@ -0,0 +1,38 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "DomeTracker.settings")
+
+import django
+
+django.setup()
+
+from scripts import rebuild_stats
+
+
+@patch("scripts.rebuild_stats.print")
+@patch("scripts.rebuild_stats.transaction")
+@patch("scripts.rebuild_stats.RollingStats")
+@patch("scripts.rebuild_stats.Summoner")
+class TestRun(unittest.TestCase):
+    def test_rebuilds_every_summoner(
+        self, mock_summoner, mock_stats, mock_transaction, mock_print
+    ):
+        summoners = [MagicMock() for _ in range(3)]
+        mock_summoner.objects.all.return_value = summoners
+
+        self.assertEqual(rebuild_stats.run(), 3)
+
+        self.assertEqual(
+            [call.args[0] for call in mock_stats.rebuild.call_args_list], summoners
+        )
+
+    def test_only_named_summoners(
+        self, mock_summoner, mock_stats, mock_transaction, mock_print
+    ):
+        rebuild_stats.run("Player1", "Player2")
+
+        mock_summoner.objects.all.return_value.filter.assert_called_once_with(
+            name__in=("Player1", "Player2")
+        )
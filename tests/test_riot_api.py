@@ -8,15 +8,33 @@ import django
 
 django.setup()
 
-from riot_api import call_api
+import riot_api
+from riot_api import call_api, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
 
 
 class TestCallApi(unittest.TestCase):
+    def setUp(self):
+        limiter_patch = patch("riot_api.limiter", RateLimiter())
+        limiter_patch.start()
+        self.addCleanup(limiter_patch.stop)
+
     @patch("riot_api.DiscordWebhook")
     @patch("riot_api.requests.get")
     def test_success(self, mock_get, mock_webhook):
         mock_resp = MagicMock()
         mock_resp.status_code = 200
+        mock_resp.headers = {}
         mock_resp.json.return_value = {"data": "test"}
         mock_get.return_value = mock_resp
 
@@ -26,15 +44,23 @@ class TestCallApi(unittest.TestCase):
         mock_get.assert_called_once()
         mock_webhook.post_to_me.assert_not_called()
 
-    @patch("riot_api.time.sleep")
+    @patch("riot_api.time")
     @patch("riot_api.DiscordWebhook")
     @patch("riot_api.requests.get")
-    def test_rate_limit_retry(self, mock_get, mock_webhook, mock_sleep):
+    def test_rate_limit_retry(self, mock_get, mock_webhook, mock_time):
+        clock = FakeClock()
+        mock_time.monotonic.side_effect = clock.monotonic
+        mock_time.sleep.side_effect = clock.sleep
         rate_limit_resp = MagicMock()
         rate_limit_resp.status_code = 429
+        rate_limit_resp.headers = {
+            "Retry-After": "5",
+            "X-Rate-Limit-Type": "application",
+        }
 
         success_resp = MagicMock()
         success_resp.status_code = 200
+        success_resp.headers = {}
         success_resp.json.return_value = {"data": "ok"}
 
         mock_get.side_effect = [rate_limit_resp, success_resp]
@@ -43,14 +69,83 @@ class TestCallApi(unittest.TestCase):
 
         self.assertEqual(result.status_code, 200)
         self.assertEqual(mock_get.call_count, 2)
-        mock_sleep.assert_called_once_with(60)
+        mock_time.sleep.assert_called_once_with(5)
         mock_webhook.post_to_me.assert_called_once()
 
+    @patch("riot_api.time")
+    @patch("riot_api.DiscordWebhook")
+    @patch("riot_api.requests.get")
+    def test_waits_for_full_window(self, mock_get, mock_webhook, mock_time):
+        clock = FakeClock()
+        mock_time.monotonic.side_effect = clock.monotonic
+        mock_time.sleep.side_effect = clock.sleep
+        mock_resp = MagicMock()
+        mock_resp.status_code = 200
+        mock_resp.headers = {
+            "X-App-Rate-Limit": "20:1,100:120",
+            "X-App-Rate-Limit-Count": "1:1,100:120",
+        }
+        mock_get.return_value = mock_resp
+
+        call_api("https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/x")
+        mock_time.sleep.assert_not_called()
+
+        call_api("https://euw1.api.riotgames.com/lol/league/v4/entries/by-summoner/x")
+        mock_time.sleep.assert_called_once_with(120)
+
+    @patch("riot_api.time")
+    @patch("riot_api.DiscordWebhook")
+    @patch("riot_api.requests.get")
+    def test_reported_windows_replace_seeded(self, mock_get, mock_webhook, mock_time):
+        clock = FakeClock()
+        mock_time.monotonic.side_effect = clock.monotonic
+        mock_time.sleep.side_effect = clock.sleep
+        mock_resp = MagicMock()
+        mock_resp.status_code = 200
+        mock_resp.headers = {
+            "X-App-Rate-Limit": "500:10,30000:600",
+            "X-App-Rate-Limit-Count": "1:10,1:600",
+        }
+        mock_get.return_value = mock_resp
+
+        url = "https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/x"
+        with patch("riot_api.settings.RIOT_APP_RATE_LIMIT", "20:1,100:120"):
+            for _ in range(50):
+                call_api(url)
+        # a production key isn't held to the seeded dev key limits
+        mock_time.sleep.assert_not_called()
+        buckets = riot_api.limiter.buckets[("euw1.api.riotgames.com", "app")]
+        self.assertEqual(sorted(buckets), [10, 600])
+        self.assertEqual(buckets[10].count, 50)
+
+    @patch("riot_api.time")
+    @patch("riot_api.DiscordWebhook")
+    @patch("riot_api.requests.get")
+    def test_method_limits_are_separate(self, mock_get, mock_webhook, mock_time):
+        clock = FakeClock()
+        mock_time.monotonic.side_effect = clock.monotonic
+        mock_time.sleep.side_effect = clock.sleep
+        mock_resp = MagicMock()
+        mock_resp.status_code = 200
+        mock_resp.headers = {
+            "X-Method-Rate-Limit": "1:10",
+            "X-Method-Rate-Limit-Count": "1:10",
+        }
+        mock_get.return_value = mock_resp
+
+        call_api("https://europe.api.riotgames.com/lol/match/v5/matches/EUW1_1")
+        call_api("https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/x")
+        mock_time.sleep.assert_not_called()
+
+        call_api("https://europe.api.riotgames.com/lol/match/v5/matches/EUW1_2")
+        mock_time.sleep.assert_called_once_with(10)
+
     @patch("riot_api.DiscordWebhook")
     @patch("riot_api.requests.get")
     def test_error_code(self, mock_get, mock_webhook):
         mock_resp = MagicMock()
         mock_resp.status_code = 403
+        mock_resp.headers = {}
         mock_resp.json.return_value = {"status": {"message": "Forbidden"}}
         mock_get.return_value = mock_resp
 
@@ -66,6 +161,7 @@ class TestCallApi(unittest.TestCase):
     def test_passes_riot_token_header(self, mock_get, mock_webhook):
         mock_resp = MagicMock()
         mock_resp.status_code = 200
+        mock_resp.headers = {}
         mock_get.return_value = mock_resp
 
         call_api("https://api.example.com/test")
@@ -74,5 +170,20 @@ class TestCallApi(unittest.TestCase):
         self.assertIn("X-Riot-Token", call_args[1]["headers"])
 
 
+class TestRateLimiterParse(unittest.TestCase):
+    def test_parse_pairs(self):
+        self.assertEqual(RateLimiter.parse("20:1,100:120"), [(20, 1), (100, 120)])
+
+    def test_parse_empty(self):
+        self.assertEqual(RateLimiter.parse(None), [])
+
+    def test_scopes_by_method(self):
+        app, method = RateLimiter.scopes(
+            "https://europe.api.riotgames.com/lol/match/v5/matches/EUW1_1"
+        )
+        self.assertEqual(app, ("europe.api.riotgames.com", "app"))
+        self.assertEqual(method, ("europe.api.riotgames.com", "match-v5"))
+
+
 if __name__ == "__main__":
     unittest.main()
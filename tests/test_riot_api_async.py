@@ -0,0 +1,122 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "DomeTracker.settings")
+
+import django
+
+django.setup()
+
+from riot_api import RateLimiter
+import riot_api_async
+from riot_api_async import RiotClient, fetch_matches, close_clients
+from tests.test_riot_api import FakeClock
+
+
+def mock_response(status, data, headers=None):
+    resp = MagicMock()
+    resp.status = status
+    resp.headers = headers or {}
+    resp.json = AsyncMock(return_value=data)
+    return resp
+
+
+class TestRiotClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        limiter_patch = patch("riot_api.limiter", RateLimiter())
+        limiter_patch.start()
+        self.addCleanup(limiter_patch.stop)
+        self.session = MagicMock()
+        self.client = RiotClient()
+        self.client.get_session = AsyncMock(return_value=self.session)
+
+    @patch("riot_api_async.DiscordWebhook")
+    async def test_success(self, mock_webhook):
+        self.session.get.return_value.__aenter__.return_value = mock_response(
+            200, ["EUW1_1"]
+        )
+
+        result = await self.client.get_match_ids("puu123", count=5)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.json(), ["EUW1_1"])
+        url = self.session.get.call_args[0][0]
+        self.assertIn("europe.api.riotgames.com", url)
+        self.assertIn("by-puuid/puu123/ids?start=0&count=5&queue=420", url)
+        mock_webhook.post_to_me.assert_not_called()
+
+    @patch("riot_api.time")
+    @patch("riot_api_async.asyncio.sleep", new_callable=AsyncMock)
+    @patch("riot_api_async.DiscordWebhook")
+    async def test_rate_limit_retry(self, mock_webhook, mock_sleep, mock_time):
+        clock = FakeClock()
+        mock_time.monotonic.side_effect = clock.monotonic
+        mock_sleep.side_effect = clock.sleep
+        self.session.get.return_value.__aenter__.side_effect = [
+            mock_response(429, {}, {"Retry-After": "1"}),
+            mock_response(200, {"id": "sum123"}),
+        ]
+
+        result = await self.client.get_summoner_by_puuid("puu123")
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(self.session.get.call_count, 2)
+        mock_sleep.assert_called_once_with(1)
+        mock_webhook.post_to_me.assert_called_once()
+
+    @patch("riot_api_async.DiscordWebhook")
+    async def test_error_code(self, mock_webhook):
+        self.session.get.return_value.__aenter__.return_value = mock_response(
+            404, {"status": {"message": "Not found"}}
+        )
+
+        result = await self.client.get_league_entries("sum123")
+
+        self.assertEqual(result.status_code, 404)
+        mock_webhook.post_to_me.assert_called_once()
+        self.assertIn("404", mock_webhook.post_to_me.call_args[0][1])
+
+    @patch("riot_api_async.DiscordWebhook")
+    async def test_get_matches_concurrently(self, mock_webhook):
+        self.session.get.return_value.__aenter__.return_value = mock_response(
+            200, {"info": {}}
+        )
+
+        results = await self.client.get_matches(["EUW1_1", "EUW1_2"])
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self.session.get.call_count, 2)
+
+
+class TestRiotClientSession(unittest.IsolatedAsyncioTestCase):
+    async def test_session_reused(self):
+        client = RiotClient()
+        first = await client.get_session()
+        second = await client.get_session()
+        self.assertIs(first, second)
+        await client.close()
+        self.assertIsNone(client.session)
+
+
+class TestFetchMatches(unittest.TestCase):
+    def tearDown(self):
+        close_clients()
+        riot_api_async.local.__dict__.clear()
+
+    @patch.object(RiotClient, "get_matches", new_callable=AsyncMock)
+    def test_client_reused_within_thread(self, mock_get_matches):
+        mock_get_matches.return_value = ["payload"]
+        self.assertEqual(fetch_matches(["EUW1_1"]), ["payload"])
+        loop, client = riot_api_async.get_client()
+        fetch_matches(["EUW1_2"])
+        self.assertEqual(riot_api_async.get_client(), (loop, client))
+        self.assertEqual(len(riot_api_async.clients), 1)
+
+        close_clients()
+        self.assertTrue(loop.is_closed())
+        self.assertEqual(riot_api_async.clients, [])
+
+
+if __name__ == "__main__":
+    unittest.main()